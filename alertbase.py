@@ -0,0 +1,227 @@
+"""
+DESCRIPTION
+Reads the AlertBase-CVP.json bug alert database downloaded by bugalertUpdate.py and answers
+which bug alerts affect a version of EOS, e.g. 4.28.3M, or a whole list of versions at once.
+
+The file is a JSON object with the bug alerts in a "bugs" list, each bug alert giving the versions
+it was introduced in and fixed in, for example:
+
+{"genId": ..., "bugs": [{"id": 123456, "versionIntroduced": "4.20.1F",
+"versionFixed": "4.21.3F, 4.22.1F", "summary": "...", "severity": "...", "cve": "..."}]}
+
+Rather than loading the whole file with json.loads(), the bug alerts are read from the file one
+at a time and only the fields needed are kept, with the versions turned into tuples of numbers
+(4.28.3M is (4, 28, 3)) once so they can be compared and sorted directly. The bug alerts are then
+grouped by release train (e.g. 4.28) and sorted by the version they were introduced in, so
+checking a version only looks at the bug alerts which could affect its train.
+
+A version is affected by a bug alert if it's the same as or after one of the versions the bug
+was introduced in and it isn't fixed. It's fixed if one of the fixed versions is in the same
+train and it's the same as or after it, or if it's in a later train than all the fixed versions.
+
+This file needs to be kept in the same directory as the scripts which use it.
+"""
+__author__ = 'marayson'
+
+import bisect
+import json
+import json.scanner
+import re
+
+# the fields of each bug alert which are kept in the index, as well as the id and versions
+KEEP_FIELDS = ('summary', 'severity', 'cve')
+
+# how much of the file is read at a time
+CHUNK_SIZE = 1024 * 1024
+
+_version_re = re.compile(r'\d+(?:\.\d+)*')
+_whitespace_re = re.compile(r'[ \t\n\r]*')
+_versions = {}
+
+
+def parse_version(version):
+    """
+    Turn a version string into a tuple of numbers which sorts in release order, e.g. 4.28.3M is
+    (4, 28, 3) and 4.28.3.1M is (4, 28, 3, 1). Returns None if there's no version number in it
+    """
+    if version not in _versions:
+        match = _version_re.search(version)
+        _versions[version] = tuple(int(x) for x in match.group(0).split('.')) if match else None
+    return _versions[version]
+
+
+def train(version):
+    """
+    Return the release train of a version tuple, e.g. (4, 28) for (4, 28, 3)
+    """
+    return version[:2]
+
+
+def split_versions(versions):
+    """
+    Version fields can be a list or a comma separated string, returns a list of version tuples
+    """
+    if versions is None:
+        return []
+    if isinstance(versions, str):
+        versions = versions.split(',')
+    parsed = [parse_version(str(x).strip()) for x in versions]
+    return [x for x in parsed if x]
+
+
+class _Reader(object):
+    # reads JSON values one at a time from a file without loading the whole file, using the same C scanner as json.loads()
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ''
+        self.pos = 0
+        self.scan_once = json.scanner.make_scanner(json.JSONDecoder())
+
+    def _fill(self):
+        data = self.f.read(CHUNK_SIZE)
+        if not data:
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        # return the next character which isn't whitespace, or '' at the end of the file
+        while True:
+            self.pos = _whitespace_re.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, characters):
+        character = self.peek()
+        if character not in characters:
+            raise ValueError('Expected one of ' + repr(characters) + ' in the bug alert database but found ' + repr(character))
+        self.pos += 1
+        return character
+
+    def value(self):
+        # decode the next value, reading more of the file if it isn't all in the buffer yet
+        self.peek()
+        while True:
+            try:
+                value, end = self.scan_once(self.buffer, self.pos)
+            except (ValueError, StopIteration):
+                if not self._fill():
+                    raise ValueError('The bug alert database ends part way through')
+                continue
+            if end == len(self.buffer) and self._fill():
+                # a number could carry on into the next chunk
+                continue
+            self.pos = end
+            return value
+
+
+def iter_bugs(filename):
+    """
+    Read the bug alerts from the database file one at a time, yields a dictionary for each one
+    """
+    with open(filename, 'r', encoding='utf-8') as f:
+        reader = _Reader(f)
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            key = reader.value()
+            reader.expect(':')
+            if key == 'bugs' and reader.peek() == '[':
+                reader.expect('[')
+                if reader.peek() != ']':
+                    while True:
+                        yield reader.value()
+                        if reader.expect(',]') == ']':
+                            break
+                else:
+                    reader.expect(']')
+            else:
+                reader.value()
+            if reader.expect(',}') == '}':
+                return
+
+
+def compact_bug(bug):
+    """
+    Return the parts of a bug alert kept in the index, or None if it has no version it was
+    introduced in
+    """
+    introduced = split_versions(bug.get('versionIntroduced'))
+    if not introduced:
+        return None
+    entry = {'id': bug.get('id'), 'introduced': introduced, 'fixed': split_versions(bug.get('versionFixed'))}
+    for field in KEEP_FIELDS:
+        if field in bug:
+            entry[field] = bug[field]
+    return entry
+
+
+class AlertIndex(object):
+    """
+    The bug alerts in the database, with the buckets of bug alerts for each release train built
+    the first time a version in that train is checked
+    """
+    def __init__(self, bugs):
+        self.bugs = bugs
+        self._trains = {}
+        # for each bug alert, the first train it was introduced in, the last train it was fixed in (None if it isn't
+        # fixed anywhere), the first version it was introduced in and the first fixed version in each train, sorted by
+        # the first train so the bug alerts which can affect a train are at the start of the list
+        self._ranges = []
+        for number, bug in enumerate(bugs):
+            introduced = min(bug['introduced'])
+            fixed = {}
+            for x in bug['fixed']:
+                if train(x) not in fixed or x < fixed[train(x)]:
+                    fixed[train(x)] = x
+            self._ranges.append((train(introduced), max(fixed) if fixed else None, introduced, fixed, number))
+        self._ranges.sort(key=lambda x: x[0])
+        self._starts = [x[0] for x in self._ranges]
+
+    @classmethod
+    def from_file(cls, filename):
+        bugs = []
+        for bug in iter_bugs(filename):
+            entry = compact_bug(bug)
+            if entry is not None:
+                bugs.append(entry)
+        return cls(bugs)
+
+    def _bucket(self, version_train):
+        # for each bug alert which can affect the train, the first version in the train it affects and the version in
+        # the train it's fixed in (None if it isn't), sorted by the first version so a version only needs checking
+        # against the bug alerts before it
+        if version_train in self._trains:
+            return self._trains[version_train]
+        bucket = []
+        for first_train, last_train, introduced, fixed, number in self._ranges[:bisect.bisect_right(self._starts, version_train)]:
+            if last_train is not None and version_train > last_train:
+                continue # fixed in an earlier train and carried forward
+            first = introduced if first_train == version_train else version_train
+            bucket.append((first, fixed.get(version_train), number))
+        bucket.sort(key=lambda x: (x[0], x[2]))
+        self._trains[version_train] = ([x[0] for x in bucket], bucket)
+        return self._trains[version_train]
+
+    def affected(self, version):
+        """
+        Return the bug alerts which affect a version of EOS, e.g. 4.28.3M
+        """
+        parsed = parse_version(version)
+        if parsed is None:
+            raise ValueError(version + ' is not a valid EOS version')
+        firsts, bucket = self._bucket(train(parsed))
+        return [self.bugs[number] for first, fixed, number in bucket[:bisect.bisect_right(firsts, parsed)]
+                if fixed is None or parsed < fixed]
+
+    def affected_versions(self, versions):
+        """
+        Check a list of versions in one go, returns a dictionary of each version to the bug
+        alerts which affect it. Each version is only checked once however many times it's in the
+        list, and each train's bucket is only built once
+        """
+        return {version: self.affected(version) for version in set(versions)}
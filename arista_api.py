@@ -0,0 +1,295 @@
+"""
+DESCRIPTION
+Talks to the arista.com software download API for eos_download.py: the session code for the
+user's API token, the folder tree of all the software on the download page and the download
+links for individual files.
+
+The session code and the download links are saved with their expiry times in
+~/.eos_download.state and reused by later runs until they expire, so a run which only needs
+files it has downloaded before doesn't have to wait for any API calls before it starts
+downloading. If arista.com rejects a saved session code a new one is fetched.
+
+The folder tree returned by getFolderTree is the whole of the software download page, so rather
+than fetching and searching through it on every run, it's indexed by folder label into the files
+in that folder and their download paths, and the index is saved to ~/.eos_download.index. The
+saved index is used until it's older than INDEX_TTL seconds. If a file can't be found in a saved
+index, eos_download.py fetches the folder tree again in case the file has been released since.
+
+This file needs to be kept in the same directory as eos_download.py.
+"""
+__author__ = 'marayson'
+
+import base64
+import calendar
+import hashlib
+import json
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+SESSION_CODE_URL = "https://www.arista.com/custom_data/api/cvp/getSessionCode/"
+FOLDER_TREE_URL = "https://www.arista.com/custom_data/api/cvp/getFolderTree/"
+DOWNLOAD_LINK_URL = "https://www.arista.com/custom_data/api/cvp/getDownloadLink/"
+
+INDEX_FILE = os.path.join(os.path.expanduser("~"), ".eos_download.index")
+STATE_FILE = os.path.join(os.path.expanduser("~"), ".eos_download.state")
+
+# how long a session code and a download link are reused for, in seconds, if the link doesn't say
+# when it expires
+SESSION_TTL = 3600
+LINK_TTL = 600
+
+# a download link isn't reused if it expires within this many seconds, so it doesn't run out
+# part way through a download
+LINK_MARGIN = 300
+
+# how long the saved index is used for before the folder tree is fetched again, in seconds
+INDEX_TTL = 86400
+
+# bump this if the format of the index or state files changes so old files are ignored
+INDEX_VERSION = 1
+STATE_VERSION = 1
+
+
+class AristaApiError(Exception):
+    pass
+
+
+class FolderIndex(object):
+    """
+    The arista.com folder tree indexed by folder label, each label maps to a dictionary of the
+    filenames in that folder and their download paths. Labels are kept in the same order as the
+    folder tree so the first EOS folder is the latest release
+    """
+    def __init__(self, labels, fetched, from_cache=False):
+        self.labels = labels
+        self.fetched = fetched
+        self.from_cache = from_cache
+
+    @classmethod
+    def from_xml(cls, folder_tree):
+        labels = {}
+        for child in ET.fromstring(folder_tree).iter('dir'):
+            label = child.attrib.get('label')
+            if label is None:
+                continue
+            files = labels.setdefault(label, {})
+            for grandchild in child.iter('file'):
+                if grandchild.text is not None:
+                    files.setdefault(grandchild.text, grandchild.attrib.get('path'))
+        return cls(labels, time.time())
+
+    def files(self, labels):
+        """
+        Return a dictionary of filename to download path for all the files in the folders with
+        the given labels, if a file is in more than one folder the first label wins
+        """
+        files = {}
+        for label in reversed(labels):
+            files.update(self.labels.get(label, {}))
+        return files
+
+    def latest_eos(self):
+        """
+        Return the latest EOS version, e.g. 4.26.1F
+        """
+        for label in self.labels:
+            if "EOS-" in label:
+                return label[4:]
+        return None
+
+
+def _read_index(filename):
+    try:
+        with open(filename, "r") as index_file:
+            saved = json.load(index_file)
+    except (OSError, ValueError):
+        return None
+    if saved.get("version") != INDEX_VERSION:
+        return None
+    return FolderIndex(saved["labels"], saved["fetched"], from_cache=True)
+
+
+def _write_index(filename, index):
+    # write to a temporary file and rename it so another run never sees a half written index,
+    # if the file can't be written the index just isn't saved
+    try:
+        with open(filename + ".tmp", "w") as index_file:
+            json.dump({"version": INDEX_VERSION, "fetched": index.fetched, "labels": index.labels}, index_file)
+        os.replace(filename + ".tmp", filename)
+    except OSError:
+        pass
+
+
+def load_folder_index(session, refresh=False, filename=INDEX_FILE, ttl=INDEX_TTL):
+    """
+    Return the FolderIndex, from the saved index file if it's newer than ttl seconds unless
+    refresh is True, otherwise from arista.com in which case the index file is updated
+    """
+    if not refresh:
+        index = _read_index(filename)
+        if index is not None and time.time() - index.fetched < ttl:
+            return index
+    index = FolderIndex.from_xml(session.folder_tree())
+    _write_index(filename, index)
+    return index
+
+
+def link_expiry(url):
+    """
+    Work out when a signed download link expires from its Expires or X-Amz-Date and
+    X-Amz-Expires parameters, if it doesn't have them assume it lasts for LINK_TTL seconds
+    """
+    query = {key.lower(): value[0] for key, value in parse_qs(urlparse(url).query).items()}
+    try:
+        if "expires" in query:
+            return float(query["expires"])
+        if "x-amz-date" in query and "x-amz-expires" in query:
+            # X-Amz-Date is in UTC
+            signed = calendar.timegm(time.strptime(query["x-amz-date"], "%Y%m%dT%H%M%SZ"))
+            return signed + float(query["x-amz-expires"])
+    except ValueError:
+        pass
+    return time.time() + LINK_TTL
+
+
+class AristaSession(object):
+    """
+    A session with the arista.com API for a user's API token. The session code and the download
+    links are saved to the state file and reused until they expire, and the session code is
+    only fetched when it's first needed
+    """
+    def __init__(self, api_token, filename=STATE_FILE):
+        # the api key needs converting into base64 which outputs a byte value and then decoding to a string
+        self.creds = base64.b64encode(api_token.encode()).decode("utf-8")
+        # the token itself isn't saved, only a hash of it to tell which session code is for which token
+        self.token_hash = hashlib.sha256(api_token.encode()).hexdigest()
+        self.filename = filename
+        self._session = None
+        self._lock = threading.Lock()
+        state = self._read_state()
+        session = state["sessions"].get(self.token_hash)
+        if session and session["expires"] > time.time():
+            self._session = session
+        self.links = {path: link for path, link in state["links"].items() if link["expires"] - LINK_MARGIN > time.time()}
+        self.retried = set()
+        self.forgotten = set()
+
+    def _read_state(self):
+        try:
+            with open(self.filename, "r") as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            state = {}
+        if state.get("version") != STATE_VERSION:
+            state = {}
+        state.setdefault("sessions", {})
+        state.setdefault("links", {})
+        return state
+
+    def save(self):
+        """
+        Save the session code and download links to the state file, merged with anything saved
+        by other runs in the meantime. The file is only readable by the user as it holds the
+        session code
+        """
+        with self._lock:
+            state = self._read_state()
+            now = time.time()
+            state["version"] = STATE_VERSION
+            state["sessions"] = {key: value for key, value in state["sessions"].items() if value["expires"] > now}
+            if self._session:
+                state["sessions"][self.token_hash] = self._session
+            state["links"] = {key: value for key, value in state["links"].items() if value["expires"] > now}
+            for path in self.forgotten:
+                state["links"].pop(path, None)
+            state["links"].update(self.links)
+            try:
+                fd = os.open(self.filename + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, "w") as state_file:
+                    json.dump(state, state_file)
+                os.replace(self.filename + ".tmp", self.filename)
+            except OSError:
+                pass
+
+    def session_code(self, stale=None):
+        """
+        Return the session code, from the state file if it hasn't expired. If stale is given
+        and it's still the current session code, a new one is fetched
+        """
+        with self._lock:
+            if self._session is None or self._session["session_code"] == stale:
+                jsonpost = {'accessToken': self.creds}
+                result = requests.post(SESSION_CODE_URL, data=json.dumps(jsonpost)).json()
+                if result["status"]["message"] == 'Access token expired':
+                    raise AristaApiError("The API token has expired. Please visit arista.com, click on your profile and select Regenerate Token then re-run the script with the new token.")
+                elif result["status"]["message"] == 'Invalid access token':
+                    raise AristaApiError("The API token is incorrect. Please visit arista.com, click on your profile and check the Access Token. Then re-run the script with the correct token.")
+                self._session = {"session_code": result["data"]["session_code"], "expires": time.time() + SESSION_TTL}
+            return self._session["session_code"]
+
+    def _post(self, url, jsonpost):
+        # a saved session code may have been expired early by arista.com, so if the call fails
+        # get a new session code and try once more
+        session_code = self.session_code()
+        for attempt in range(2):
+            result = requests.post(url, data=json.dumps(dict(jsonpost, sessionCode=session_code))).json()
+            if isinstance(result.get("data"), dict):
+                return result["data"]
+            if attempt == 0:
+                session_code = self.session_code(stale=session_code)
+        raise AristaApiError("arista.com API call failed: " + str(result.get("status", result)))
+
+    def folder_tree(self):
+        """
+        Fetch the current folder tree, similar to what you see on the download page in XML format
+        """
+        return self._post(FOLDER_TREE_URL, {})["xml"]
+
+    def _link_valid(self, path):
+        return path in self.links and self.links[path]["expires"] - LINK_MARGIN > time.time()
+
+    def download_link(self, path):
+        """
+        Use the path of a file from the folder tree and the session code to get the direct
+        download link URL for the file, reusing a saved link if it hasn't expired
+        """
+        # a link fetched earlier in the run can run out while it waits behind other downloads, so
+        # it's checked against its expiry each time it's used
+        if self._link_valid(path):
+            return self.links[path]["url"]
+        url = self._post(DOWNLOAD_LINK_URL, {'filePath': path})["url"]
+        self.links[path] = {"url": url, "expires": link_expiry(url)}
+        return url
+
+    def forget_link(self, path):
+        """
+        Drop a download link which didn't work, returns True if it's worth getting a new link and
+        trying again, which is only the case the first time a link for the path fails in this run
+        """
+        self.links.pop(path, None)
+        self.forgotten.add(path)
+        if path in self.retried:
+            return False
+        self.retried.add(path)
+        return True
+
+    def download_links(self, paths, workers=8):
+        """
+        Get the download links for several files at once, the ones which haven't been saved are
+        fetched in parallel. Returns a dictionary of path to link
+        """
+        paths = list(dict.fromkeys(paths))
+        missing = [path for path in paths if not self._link_valid(path)]
+        if missing:
+            # get the session code first so the threads don't all ask for one
+            self.session_code()
+            with ThreadPoolExecutor(max_workers=min(workers, len(missing))) as executor:
+                list(executor.map(self.download_link, missing))
+        self.save()
+        return {path: self.links[path]["url"] for path in paths}
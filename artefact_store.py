@@ -0,0 +1,183 @@
+"""
+DESCRIPTION
+A local store of files downloaded from arista.com, shared by eos_download.py and
+bugalertUpdate.py. Each file is kept once under its checksum, e.g.
+~/.arista_artefacts/objects/sha512/3f/3fa2..., with an index of which filename was last seen with
+which checksum. A script can then check the store before downloading a file, and runs from
+different directories or from cron share the same downloads rather than fetching the same image
+again.
+
+Files are put into and copied out of the store with hard links where possible, so a file in the
+store and in the current directory only takes up disk space once. When the store grows past its
+size cap the least recently used files are removed.
+
+This file needs to be kept in the same directory as the scripts which use it.
+"""
+__author__ = 'marayson'
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # no file locking on Windows, runs at the same time could lose each other's index updates
+    fcntl = None
+
+STORE_DIR = os.path.join(os.path.expanduser("~"), ".arista_artefacts")
+
+# default size cap for the store in bytes
+STORE_SIZE = 20 * 1024 * 1024 * 1024
+
+# bump this if the format of the index changes so old indexes are ignored
+INDEX_VERSION = 1
+
+
+def file_checksum(filename, algorithm='sha256'):
+    """
+    Work out the checksum of a file which is already on disk
+    """
+    checksum = hashlib.new(algorithm)
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+def link_or_copy(source, destination):
+    """
+    Hard link source to destination, or copy it if they're on different filesystems, replacing
+    destination if it already exists
+    """
+    tmp = destination + '.tmp'
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, destination)
+
+
+class ArtefactStore(object):
+    """
+    The store lives in a directory with an objects folder holding the files under their
+    checksums and an index.json file recording the size and last use of each object and the
+    checksum each filename was last seen with
+    """
+    def __init__(self, directory=STORE_DIR, max_size=STORE_SIZE):
+        self.directory = os.path.expanduser(directory)
+        self.max_size = max_size
+        os.makedirs(os.path.join(self.directory, 'objects'), exist_ok=True)
+        self.index_file = os.path.join(self.directory, 'index.json')
+
+    def object_path(self, algorithm, digest):
+        return os.path.join(self.directory, 'objects', algorithm, digest[:2], digest)
+
+    @contextmanager
+    def _index(self):
+        # read the index, let the caller change it and write it back, holding a lock on the store
+        # so other runs don't change it at the same time
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.index_file, 'r') as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {}
+            if index.get('version') != INDEX_VERSION:
+                index = {'version': INDEX_VERSION, 'objects': {}, 'files': {}}
+            yield index
+            with open(self.index_file + '.tmp', 'w') as f:
+                json.dump(index, f)
+            os.replace(self.index_file + '.tmp', self.index_file)
+
+    def get(self, algorithm, digest):
+        """
+        Return the path of the object with this checksum, or None if it isn't in the store
+        """
+        key = algorithm + ':' + digest.lower()
+        path = self.object_path(algorithm, digest.lower())
+        with self._index() as index:
+            if key not in index['objects'] or not os.path.isfile(path):
+                index['objects'].pop(key, None)
+                return None
+            index['objects'][key]['last_used'] = time.time()
+        return path
+
+    def checksum_for(self, filename):
+        """
+        Return the (algorithm, checksum) the filename was last stored with, or None
+        """
+        with self._index() as index:
+            key = index['files'].get(os.path.basename(filename))
+            if key is None or key not in index['objects']:
+                return None
+        return tuple(key.split(':', 1))
+
+    def lookup(self, filename):
+        """
+        Return the path of the object last stored under this filename, or None
+        """
+        checksum = self.checksum_for(filename)
+        if checksum is None:
+            return None
+        return self.get(*checksum)
+
+    def add(self, source, algorithm, digest, filename=None):
+        """
+        Put a file into the store under its checksum, which the caller has already worked out,
+        and record it against filename (the name of source by default). Returns the path of the
+        object in the store
+        """
+        digest = digest.lower()
+        key = algorithm + ':' + digest
+        path = self.object_path(algorithm, digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not os.path.isfile(path):
+            link_or_copy(source, path)
+        with self._index() as index:
+            index['objects'][key] = {'size': os.path.getsize(path), 'last_used': time.time()}
+            index['files'][os.path.basename(filename or source)] = key
+            self._evict(index, key)
+        return path
+
+    def add_bytes(self, data, filename, algorithm='sha256'):
+        """
+        Put data into the store, returns the path of the object in the store
+        """
+        digest = hashlib.new(algorithm, data).hexdigest()
+        path = self.object_path(algorithm, digest)
+        if not os.path.isfile(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.tmp', path)
+        return self.add(path, algorithm, digest, filename)
+
+    def export(self, path, destination):
+        """
+        Put a copy of an object from the store at destination
+        """
+        link_or_copy(path, destination)
+
+    def _evict(self, index, keep):
+        # remove the least recently used objects until the store is under its size cap, apart
+        # from the object which has just been added
+        total = sum(entry['size'] for entry in index['objects'].values())
+        for key, entry in sorted(index['objects'].items(), key=lambda item: item[1]['last_used']):
+            if total <= self.max_size:
+                break
+            if key == keep:
+                continue
+            path = self.object_path(*key.split(':', 1))
+            if os.path.isfile(path):
+                os.remove(path)
+            del index['objects'][key]
+            total -= entry['size']
+        index['files'] = {name: key for name, key in index['files'].items() if key in index['objects']}
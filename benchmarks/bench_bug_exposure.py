@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+
+"""
+DESCRIPTION
+Benchmark for bug_exposure.py, runs it against the mock eAPI server with more and more switches
+running the same handful of EOS versions, so it can be seen that checking the versions against
+the bug alert database takes the same time however many switches there are.
+
+Run the script using the following:
+./bench_bug_exposure.py --alertbase AlertBase-CVP.json --switches 100 --switches 1000 --versions 4.28.3M,4.27.2F,4.26.1F
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_eapi_server import start_server, write_eapi_conf
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+bug_exposure = os.path.join(script_dir, "..", "bug_exposure.py")
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--alertbase', required=True,
+                    help='Bug alert database to check the switches against')
+parser.add_argument('--switches', required=False, type=int, action='append',
+                    default=[], help='Number of mock switches to check, repeat for each value')
+parser.add_argument('--versions', required=False,
+                    default='4.28.3M,4.27.2F,4.26.1F,4.25.5M', help='Comma separated EOS versions for the mock switches to run')
+parser.add_argument('--latency', required=False, type=float,
+                    default=0.0, help='Seconds to delay every eAPI request by')
+parser.add_argument('--workers', required=False, type=int,
+                    default=50, help='Number of switches bug_exposure.py collects the version from in parallel')
+args = parser.parse_args()
+
+server = start_server(0, args.latency, versions=args.versions.split(","))
+port = server.server_address[1]
+alertbase = os.path.abspath(args.alertbase)
+
+# bug_exposure.py reads ~/.eapi.conf so point HOME at a temporary directory for the mock switches
+with tempfile.TemporaryDirectory() as home:
+    env = dict(os.environ, HOME=home)
+    for switches in args.switches or [100, 1000]:
+        write_eapi_conf(os.path.join(home, ".eapi.conf"), port, ["switch" + str(i) for i in range(1, switches + 1)])
+        start_time = time.time()
+        result = subprocess.run([sys.executable, bug_exposure, "--alertbase", alertbase, "--workers", str(args.workers),
+                                 "--output", os.path.join(home, "exposure.json")],
+                                env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True)
+        elapsed = time.time() - start_time
+        collect_time, check_time = re.search(r"\(([\d.]+) seconds collecting versions, ([\d.]+) seconds checking", result.stdout).groups()
+        print("%d switches: %.2f seconds, %s seconds collecting versions, %s seconds checking them" %
+              (switches, elapsed, collect_time, check_time))
+
+server.shutdown()
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+
+"""
+DESCRIPTION
+Benchmark for downloader.py, downloads a test file from the local Range capable HTTP server with
+the old single stream 1 KB chunk loop followed by openssl sha512 and then with downloader.download_file() using different
+numbers of streams.
+
+Run the script using the following:
+./bench_download.py --size 256 --rate 50000000 --streams 1 --streams 4 --streams 8
+"""
+
+import argparse
+import filecmp
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+from range_http_server import start_server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from downloader import download_file
+
+
+# the download loop as it was in eos_download.py before, without the progress bar
+def legacy_download_file(url, filename):
+    r = requests.get(url, stream=True)
+    with open(filename, 'wb') as f:
+        for chunk in r.iter_content(chunk_size=1024):
+            if chunk:
+                f.write(chunk)
+    return filename
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--size', required=False, type=int,
+                    default=256, help='Size of the test file in MB')
+parser.add_argument('--rate', required=False, type=float,
+                    default=50000000, help='Maximum bytes per second for each connection, 0 for no limit')
+parser.add_argument('--streams', required=False, type=int, action='append',
+                    default=[], help='Number of streams to benchmark, repeat for each value')
+parser.add_argument('--drop_after', required=False, type=int,
+                    default=0, help='Close each connection after this many bytes to simulate a flaky link')
+parser.add_argument('--skip_legacy', required=False, action='store_true',
+                    help='Only time downloader.download_file()')
+args = parser.parse_args()
+
+with tempfile.TemporaryDirectory() as directory:
+    source = os.path.join(directory, "EOS-test.swi")
+    with open(source, "wb") as f:
+        for i in range(args.size):
+            f.write(os.urandom(1024 * 1024))
+    with open(source, "rb") as f:
+        source_checksum = hashlib.sha512(f.read()).hexdigest()
+    server = start_server(directory, 0, args.rate, args.drop_after)
+    url = "http://127.0.0.1:%d/EOS-test.swi" % server.server_address[1]
+    target = os.path.join(directory, "download.swi")
+
+    if not args.skip_legacy:
+        start_time = time.time()
+        legacy_download_file(url, target)
+        os.popen("openssl sha512 " + target).read()
+        print("previous download loop and openssl sha512: %.2f seconds" % (time.time() - start_time))
+        os.remove(target)
+
+    for streams in args.streams or [1, 4, 8]:
+        start_time = time.time()
+        checksum = download_file(url, target, streams)[1]
+        elapsed = time.time() - start_time
+        print("download_file with %d streams: %.2f seconds, %.1f MB/s, %s, %s" % (streams, elapsed, args.size / elapsed,
+              "file matches" if filecmp.cmp(source, target, shallow=False) else "FILE DIFFERS",
+              "checksum matches" if checksum == source_checksum else "CHECKSUM DIFFERS"))
+        os.remove(target)
+
+    server.shutdown()
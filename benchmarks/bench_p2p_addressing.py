@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+
+"""
+DESCRIPTION
+Benchmark for the address assignment in point-to-point-addressing.py using a synthetic leaf-spine
+topology, no switches are needed. The previous approach of searching the neighbor's links and
+building the full list of /30 subnets is timed alongside for comparison.
+
+Run the script using the following:
+./bench_p2p_addressing.py --spines 20 --leaves 500 --subnet 10.0.0.0/8
+
+This example builds a topology with 10,000 links.
+"""
+
+import argparse
+import copy
+import importlib.util
+import ipaddress
+import os
+import sys
+import time
+
+from mock_eapi_server import build_fabric
+
+# point-to-point-addressing.py can't be imported by name because of the hyphens
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(script_dir, ".."))
+spec = importlib.util.spec_from_file_location("p2p", os.path.join(script_dir, "..", "point-to-point-addressing.py"))
+p2p = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(p2p)
+
+
+# the address assignment as it was done before, with the config pushes taken out
+def legacy_assign_addresses(topology, network_range):
+    n = 0
+    available_subnets = list(ipaddress.ip_network(network_range).subnets(prefixlen_diff=(30-network_range.prefixlen)))
+    for host in topology:
+        r = 0
+        for interface in topology[host]:
+            if interface["ip_address"] == '':
+                topology[host][r]["ip_address"] = str(list(available_subnets[n].hosts())[0])
+                s = 0
+                for neighbor_int in topology[(topology[host][r]["neighbor_sw"])]:
+                    if neighbor_int["local_int"] == topology[host][r]["neighbor_int"]:
+                        topology[(topology[host][r]["neighbor_sw"])][s]["ip_address"] = str(list(available_subnets[n].hosts())[1])
+                        break
+                    s += 1
+                n += 1
+                r += 1
+            else:
+                r += 1
+
+
+# turn the mock LLDP output into the topology dictionary built by point-to-point-addressing.py
+def build_topology(spines, leaves):
+    topology = {}
+    lldp = build_fabric(spines, leaves)
+    for x in lldp:
+        topology[x] = [{'local_int': i["port"], 'neighbor_sw': i["neighborDevice"].rsplit(".")[0],
+                        'neighbor_int': i["neighborPort"], 'ip_address': ""} for i in lldp[x]]
+    return topology
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--spines', required=False, type=int,
+                    default=20, help='Number of spine switches in the synthetic topology')
+parser.add_argument('--leaves', required=False, type=int,
+                    default=500, help='Number of leaf switches in the synthetic topology')
+parser.add_argument('--subnet', required=False,
+                    default='10.0.0.0/8', help='IP subnet to take the /30 subnets from')
+parser.add_argument('--legacy_subnet', required=False,
+                    default='10.0.0.0/16', help='Smaller IP subnet for the previous approach as it builds the full list of subnets')
+parser.add_argument('--skip_legacy', required=False, action='store_true',
+                    help='Only time the current approach')
+args = parser.parse_args()
+
+topology = build_topology(args.spines, args.leaves)
+print("Synthetic topology with %d links" % (args.spines * args.leaves))
+
+start_time = time.time()
+plan = p2p.assign_addresses(copy.deepcopy(topology), ipaddress.ip_network(args.subnet))
+print("assign_addresses over %s: %.3f seconds, %d interfaces" % (args.subnet, time.time() - start_time, len(plan)))
+
+if not args.skip_legacy:
+    start_time = time.time()
+    legacy_assign_addresses(copy.deepcopy(topology), ipaddress.ip_network(args.legacy_subnet))
+    print("previous approach over %s: %.3f seconds" % (args.legacy_subnet, time.time() - start_time))
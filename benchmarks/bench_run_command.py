@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+
+"""
+DESCRIPTION
+Benchmark for run_command.py, runs it against the mock eAPI server with a single worker and then
+with a pool of workers so the speedup from configuring switches in parallel can be seen.
+
+Run the script using the following:
+./bench_run_command.py --switches 100 --latency 0.2 --workers 1 --workers 50
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_eapi_server import start_server, write_eapi_conf
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+run_command = os.path.join(script_dir, "..", "run_command.py")
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--switches', required=False, type=int,
+                    default=100, help='Number of mock switches to configure')
+parser.add_argument('--latency', required=False, type=float,
+                    default=0.2, help='Seconds to delay every eAPI request by')
+parser.add_argument('--workers', required=False, type=int, action='append',
+                    default=[], help='Worker count to benchmark, repeat for each value')
+args = parser.parse_args()
+
+workers_list = args.workers or [1, 50]
+server = start_server(0, args.latency)
+port = server.server_address[1]
+
+# run_command.py reads ~/.eapi.conf so point HOME at a temporary directory for the mock switches
+with tempfile.TemporaryDirectory() as home:
+    write_eapi_conf(os.path.join(home, ".eapi.conf"), port, ["switch" + str(i) for i in range(1, args.switches + 1)])
+    env = dict(os.environ, HOME=home)
+    for workers in workers_list:
+        start_time = time.time()
+        subprocess.run([sys.executable, run_command, "--conf", "ip routing", "--workers", str(workers)],
+                       env=env, check=True, stdout=subprocess.DEVNULL)
+        print("%d switches, %d workers: %.2f seconds" % (args.switches, workers, time.time() - start_time))
+
+server.shutdown()
@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+
+"""
+DESCRIPTION
+Benchmark for cvp_ssh.py, uploads a test file to the local SFTP server with paramiko's sftp.put()
+as eos_download.py used to and then with cvp_ssh.upload_file() using different numbers of
+streams, then uploads it once more to check the upload is skipped when the server already has
+the file.
+
+Run the script using the following:
+./bench_upload.py --size 256 --latency 50 --streams 1 --streams 4
+"""
+
+import argparse
+import filecmp
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+import paramiko
+
+from sftp_server import start_server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from cvp_ssh import connect, upload_file
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--size', required=False, type=int,
+                    default=256, help='Size of the test file in MB')
+parser.add_argument('--latency', required=False, type=float,
+                    default=50, help='Round trip time to simulate in milliseconds')
+parser.add_argument('--rate', required=False, type=float,
+                    default=0, help='Maximum bytes per second for each connection, 0 for no limit')
+parser.add_argument('--streams', required=False, type=int, action='append',
+                    default=[], help='Number of streams to benchmark, repeat for each value')
+parser.add_argument('--skip_legacy', required=False, action='store_true',
+                    help='Only time cvp_ssh.upload_file()')
+args = parser.parse_args()
+
+with tempfile.TemporaryDirectory() as directory:
+    source = os.path.join(directory, "EOS-test.swi")
+    with open(source, "wb") as f:
+        for i in range(args.size):
+            f.write(os.urandom(1024 * 1024))
+    with open(source, "rb") as f:
+        checksum = ('sha512', hashlib.sha512(f.read()).hexdigest())
+    root = os.path.join(directory, "cvp")
+    os.makedirs(os.path.join(root, "root"))
+    server = start_server(root, 0, "arista", args.latency / 1000, args.rate)
+    port = server.server_address[1]
+    target = os.path.join(root, "root", "EOS-test.swi")
+
+    if not args.skip_legacy:
+        # the upload as it was in eos_download.py before, without the progress bar
+        start_time = time.time()
+        t = paramiko.Transport(("127.0.0.1", port))
+        t.connect(username="root", password="arista")
+        sftp = paramiko.SFTPClient.from_transport(t)
+        sftp.put(source, '/root/EOS-test.swi')
+        t.close()
+        elapsed = time.time() - start_time
+        print("previous sftp.put: %.2f seconds, %.1f MB/s" % (elapsed, args.size / elapsed))
+        os.remove(target)
+
+    for streams in args.streams or [1, 4]:
+        start_time = time.time()
+        transport = connect("127.0.0.1", "root", "arista", port)
+        upload_file(transport, source, '/root/EOS-test.swi', streams, checksum)
+        transport.close()
+        elapsed = time.time() - start_time
+        print("upload_file with %d streams: %.2f seconds, %.1f MB/s, %s" % (streams, elapsed, args.size / elapsed,
+              "file matches" if filecmp.cmp(source, target, shallow=False) else "FILE DIFFERS"))
+        os.remove(target)
+
+    upload_file(connect("127.0.0.1", "root", "arista", port), source, '/root/EOS-test.swi', 4)
+    start_time = time.time()
+    transport = connect("127.0.0.1", "root", "arista", port)
+    uploaded = upload_file(transport, source, '/root/EOS-test.swi', 4, checksum)
+    transport.close()
+    print("upload_file when the server already has the file: %.2f seconds, %s" % (time.time() - start_time,
+          "uploaded again" if uploaded else "skipped"))
+
+    server.shutdown()
@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+
+"""
+DESCRIPTION
+A very small mock of the EOS eAPI (JSON-RPC over HTTP) for benchmarking the pyeapi scripts in
+this repository without any real switches. Every request is delayed by --latency seconds to
+simulate the round trip to a switch. The switch name is taken from the username used to log
+in, so a single server can pretend to be a whole fleet of switches.
+
+Run the script using the following:
+./mock_eapi_server.py --port 8080 --latency 0.2 --switches 400 --conf eapi.conf
+
+This starts the server on port 8080 and writes an eapi.conf file with 400 switches pointing
+at it which can be copied to ~/.eapi.conf. Use --spines and --leaves instead of --switches to
+mock a leaf-spine fabric, each leaf is connected to every spine and 'show lldp neighbors'
+returns the links. Interface addresses configured with 'ip address' are remembered and returned
+by 'show ip interface brief'. 'show version' returns one of the EOS versions given with
+--versions for each switch.
+"""
+
+import argparse
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# build the LLDP neighbors for a leaf-spine fabric where every leaf is connected to every spine,
+# Ethernet(n) on a spine goes to leaf n and Ethernet(n) on a leaf goes to spine n
+def build_fabric(spines, leaves):
+    lldp = {}
+    for s in range(1, spines + 1):
+        lldp["spine" + str(s)] = []
+    for l in range(1, leaves + 1):
+        lldp["leaf" + str(l)] = []
+    for s in range(1, spines + 1):
+        for l in range(1, leaves + 1):
+            lldp["spine" + str(s)].append({"port": "Ethernet" + str(l), "neighborDevice": "leaf" + str(l) + ".lab",
+                                           "neighborPort": "Ethernet" + str(s), "ttl": 120})
+            lldp["leaf" + str(l)].append({"port": "Ethernet" + str(s), "neighborDevice": "spine" + str(s) + ".lab",
+                                          "neighborPort": "Ethernet" + str(l), "ttl": 120})
+    return lldp
+
+
+# build the canned response for a single show command, anything not listed here is treated
+# as a config command and returns an empty result like EOS does
+def command_result(server, hostname, command):
+    if command == "show hostname":
+        return {"hostname": hostname, "fqdn": hostname}
+    elif command == "show version":
+        # share the EOS versions out between the switches by the number in their name
+        number = int("".join(c for c in hostname if c.isdigit()) or 0)
+        return {"version": server.versions[number % len(server.versions)], "modelName": "vEOS-lab", "serialNumber": hostname}
+    elif command == "show ip interface brief":
+        return {"interfaces": server.interfaces.get(hostname, {})}
+    elif command == "show lldp neighbors":
+        return {"lldpNeighbors": server.lldp.get(hostname, [])}
+    return {}
+
+
+class EapiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        request = json.loads(body)
+        hostname = "switch"
+        auth = self.headers.get("Authorization", "")
+        if auth.startswith("Basic "):
+            hostname = base64.b64decode(auth[6:]).decode("utf-8").split(":")[0]
+        time.sleep(self.server.latency)
+        results = []
+        interface = None
+        # pyeapi sends the parameters by name, jsonrpclib's runCmds(1, cmds) sends them in order
+        params = request["params"]
+        commands = params["cmds"] if isinstance(params, dict) else params[1]
+        for command in commands:
+            if isinstance(command, dict):
+                command = command["cmd"]
+            # remember any interface addresses which are configured
+            if command.startswith("interface "):
+                interface = command[len("interface "):]
+            elif command.startswith("ip address ") and interface:
+                address, mask_len = command[len("ip address "):].split("/")
+                self.server.interfaces.setdefault(hostname, {})[interface] = {
+                    "name": interface, "interfaceStatus": "connected", "lineProtocolStatus": "up",
+                    "interfaceAddress": {"ipAddr": {"address": address, "maskLen": int(mask_len)}}}
+            results.append(command_result(self.server, hostname, command))
+        response = json.dumps({"jsonrpc": "2.0", "id": request.get("id"), "result": results}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class EapiServer(ThreadingHTTPServer):
+    # allow plenty of connections to queue up when the scripts use a lot of workers
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+# start the mock server in a background thread and return it, call shutdown() to stop it
+def start_server(port=0, latency=0.0, lldp=None, versions=None):
+    server = EapiServer(("127.0.0.1", port), EapiHandler)
+    server.latency = latency
+    server.lldp = lldp or {}
+    server.versions = versions or ["4.28.3M"]
+    server.interfaces = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+# write an eapi.conf file with the given switch names all pointing at the mock server
+def write_eapi_conf(filename, port, hostnames):
+    with open(filename, "w") as file_object:
+        for hostname in hostnames:
+            file_object.write("[connection:" + hostname + "]\n")
+            file_object.write("host: 127.0.0.1\n")
+            file_object.write("port: " + str(port) + "\n")
+            file_object.write("username: " + hostname + "\n")
+            file_object.write("password: arista\n")
+            file_object.write("transport: http\n")
+            file_object.write("\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', required=False, type=int,
+                        default=8080, help='TCP port to listen on')
+    parser.add_argument('--latency', required=False, type=float,
+                        default=0.2, help='Seconds to delay every eAPI request by')
+    parser.add_argument('--switches', required=False, type=int,
+                        default=0, help='Number of switches to write to the eapi.conf file')
+    parser.add_argument('--spines', required=False, type=int,
+                        default=0, help='Number of spine switches to mock in a leaf-spine fabric')
+    parser.add_argument('--leaves', required=False, type=int,
+                        default=0, help='Number of leaf switches to mock in a leaf-spine fabric')
+    parser.add_argument('--conf', required=False,
+                        default='', help='Filename to write an eapi.conf file to for the mock switches')
+    parser.add_argument('--versions', required=False,
+                        default='4.28.3M', help='Comma separated EOS versions for show version to share out between the switches')
+    args = parser.parse_args()
+
+    lldp = build_fabric(args.spines, args.leaves)
+    hostnames = list(lldp) + ["switch" + str(i) for i in range(1, args.switches + 1)]
+    if args.conf:
+        write_eapi_conf(args.conf, args.port, hostnames)
+    server = start_server(args.port, args.latency, lldp, args.versions.split(","))
+    print("Mock eAPI server listening on port " + str(args.port))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
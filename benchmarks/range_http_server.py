@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+
+"""
+DESCRIPTION
+A small HTTP server which serves the files in a directory and supports Range requests, for
+benchmarking downloader.py without downloading from arista.com. Each connection can be limited
+to --rate bytes per second to simulate a WAN link where a single TCP stream can't fill the pipe,
+and --drop_after closes each connection after that many bytes to simulate a flaky link.
+
+Run the script using the following:
+./range_http_server.py --dir /tmp/images --port 8000 --rate 20000000
+"""
+
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BLOCK_SIZE = 256 * 1024
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        filename = os.path.join(self.server.directory, os.path.basename(self.path.split("?")[0]))
+        if not os.path.isfile(filename):
+            self.send_error(404)
+            return
+        size = os.path.getsize(filename)
+        start, end = 0, size - 1
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), size - 1)
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */%d" % size)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" % (start, end, size))
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Last-Modified", self.date_time_string(int(os.path.getmtime(filename))))
+        self.end_headers()
+        with open(filename, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            sent = 0
+            while remaining > 0:
+                block = f.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                if self.server.drop_after and sent + len(block) > self.server.drop_after:
+                    self.wfile.write(block[:self.server.drop_after - sent])
+                    self.close_connection = True
+                    return
+                self.wfile.write(block)
+                sent += len(block)
+                remaining -= len(block)
+                # sleep for as long as the block would have taken at the per connection rate
+                if self.server.rate:
+                    time.sleep(len(block) / self.server.rate)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RangeServer(ThreadingHTTPServer):
+    request_queue_size = 128
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # the client closing the connection part way through a download is expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            ThreadingHTTPServer.handle_error(self, request, client_address)
+
+
+# start the server in a background thread and return it, call shutdown() to stop it
+def start_server(directory, port=0, rate=0, drop_after=0):
+    server = RangeServer(("127.0.0.1", port), RangeHandler)
+    server.directory = directory
+    server.rate = rate
+    server.drop_after = drop_after
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dir', required=False,
+                        default='.', help='Directory of files to serve')
+    parser.add_argument('--port', required=False, type=int,
+                        default=8000, help='TCP port to listen on')
+    parser.add_argument('--rate', required=False, type=float,
+                        default=0, help='Maximum bytes per second for each connection, 0 for no limit')
+    parser.add_argument('--drop_after', required=False, type=int,
+                        default=0, help='Close each connection after sending this many bytes, 0 to never close')
+    args = parser.parse_args()
+
+    server = start_server(args.dir, args.port, args.rate, args.drop_after)
+    print("Serving " + args.dir + " on port " + str(args.port))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,263 @@
+#!/usr/bin/python3
+
+"""
+DESCRIPTION
+A small SSH/SFTP server for testing and benchmarking cvp_ssh.py without a CVP server. It serves
+the files in a directory (so /root/EOS-4.26.1F.swi is DIR/root/EOS-4.26.1F.swi), accepts any
+username with the given password and runs md5sum, sha256sum and sha512sum commands on its own
+files so the checksum checks can be tested. --latency delays everything sent by the client by
+that many milliseconds to simulate the round trip time of a WAN link, and --rate limits each
+connection to that many bytes per second.
+
+Run the script using the following:
+./sftp_server.py --dir /tmp/cvp --port 2222 --password arista --latency 50
+"""
+
+import argparse
+import collections
+import hashlib
+import logging
+import os
+import shlex
+import socket
+import threading
+import time
+
+import paramiko
+
+BLOCK_SIZE = 256 * 1024
+
+logging.getLogger("sftp_server.transport").setLevel(logging.CRITICAL)
+
+CHECKSUM_COMMANDS = {'md5sum': 'md5', 'sha256sum': 'sha256', 'sha512sum': 'sha512'}
+
+
+class StubServer(paramiko.ServerInterface):
+    def __init__(self, server):
+        self.server = server
+
+    def check_auth_password(self, username, password):
+        if password == self.server.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED_FAILED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self.server.run_command, args=(channel, command.decode("utf-8")), daemon=True).start()
+        return True
+
+
+class StubSFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat((self.readfile or self.writefile).fileno()))
+
+
+class StubSFTPServer(paramiko.SFTPServerInterface):
+    def __init__(self, server, *args, **kwargs):
+        paramiko.SFTPServerInterface.__init__(self, server, *args, **kwargs)
+        self.root = server.server.directory
+
+    def _local(self, path):
+        return os.path.join(self.root, self.canonicalize(path).lstrip("/"))
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._local(path)))
+        except OSError as ERR:
+            return paramiko.SFTPServer.convert_errno(ERR.errno)
+
+    lstat = stat
+
+    def list_folder(self, path):
+        try:
+            local = self._local(path)
+            return [paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(local, name)), name) for name in os.listdir(local)]
+        except OSError as ERR:
+            return paramiko.SFTPServer.convert_errno(ERR.errno)
+
+    def open(self, path, flags, attr):
+        local = self._local(path)
+        try:
+            os.makedirs(os.path.dirname(local), exist_ok=True)
+            fd = os.open(local, flags, 0o644)
+        except OSError as ERR:
+            return paramiko.SFTPServer.convert_errno(ERR.errno)
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            mode = "rb"
+        f = os.fdopen(fd, mode)
+        handle = StubSFTPHandle(flags)
+        handle.filename = local
+        handle.readfile = f
+        handle.writefile = f
+        return handle
+
+    def remove(self, path):
+        try:
+            os.remove(self._local(path))
+        except OSError as ERR:
+            return paramiko.SFTPServer.convert_errno(ERR.errno)
+        return paramiko.SFTP_OK
+
+    def rename(self, oldpath, newpath):
+        try:
+            os.rename(self._local(oldpath), self._local(newpath))
+        except OSError as ERR:
+            return paramiko.SFTPServer.convert_errno(ERR.errno)
+        return paramiko.SFTP_OK
+
+    def chattr(self, path, attr):
+        return paramiko.SFTP_OK
+
+
+class DelayedSocket(object):
+    """
+    Forwards the client's socket to the SSH transport through a socket pair, holding back what
+    the client sends for the latency and pacing it to the rate
+    """
+    def __init__(self, sock, latency, rate):
+        self.client = sock
+        self.transport_end, self.forward_end = socket.socketpair()
+        self.latency = latency
+        self.rate = rate
+        self.queue = collections.deque()
+        self.ready = threading.Condition()
+        for target in (self._receive, self._deliver, self._reply):
+            threading.Thread(target=target, daemon=True).start()
+
+    def _receive(self):
+        while True:
+            try:
+                data = self.client.recv(BLOCK_SIZE)
+            except OSError:
+                data = b""
+            with self.ready:
+                self.queue.append((time.time() + self.latency, data))
+                self.ready.notify()
+            if not data:
+                return
+
+    def _deliver(self):
+        while True:
+            with self.ready:
+                while not self.queue:
+                    self.ready.wait()
+                due, data = self.queue.popleft()
+            time.sleep(max(0, due - time.time()))
+            if not data:
+                self.forward_end.close()
+                return
+            try:
+                self.forward_end.sendall(data)
+            except OSError:
+                return
+            if self.rate:
+                time.sleep(len(data) / self.rate)
+
+    def _reply(self):
+        while True:
+            try:
+                data = self.forward_end.recv(BLOCK_SIZE)
+                if not data:
+                    break
+                self.client.sendall(data)
+            except OSError:
+                break
+        self.client.close()
+
+
+class SFTPTestServer(object):
+    def __init__(self, directory, port=0, password="arista", latency=0, rate=0, host_key=None):
+        self.directory = directory
+        self.password = password
+        self.latency = latency
+        self.rate = rate
+        # pass the same host_key to servers started together to save generating a key for each one
+        self.host_key = host_key or paramiko.RSAKey.generate(2048)
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(("127.0.0.1", port))
+        self.listener.listen(16)
+        self.server_address = self.listener.getsockname()
+        self.commands = []
+
+    def serve_forever(self):
+        while True:
+            try:
+                sock = self.listener.accept()[0]
+            except OSError:
+                return
+            if self.latency or self.rate:
+                sock = DelayedSocket(sock, self.latency, self.rate).transport_end
+            transport = paramiko.Transport(sock)
+            # the client closing the connection at the end of an upload is expected
+            transport.set_log_channel("sftp_server.transport")
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, StubSFTPServer)
+            transport.start_server(server=StubServer(self))
+
+    def run_command(self, channel, command):
+        # only the checksum commands are supported, anything else is recorded and exits with 127
+        self.commands.append(command)
+        args = shlex.split(command)
+        status = 127
+        if len(args) == 2 and args[0] in CHECKSUM_COMMANDS:
+            try:
+                checksum = hashlib.new(CHECKSUM_COMMANDS[args[0]])
+                with open(os.path.join(self.directory, args[1].lstrip("/")), "rb") as f:
+                    for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+                        checksum.update(block)
+                channel.sendall((checksum.hexdigest() + "  " + args[1] + "\n").encode("utf-8"))
+                status = 0
+            except OSError as ERR:
+                channel.sendall_stderr((args[0] + ": " + args[1] + ": " + ERR.strerror + "\n").encode("utf-8"))
+                status = 1
+        else:
+            channel.sendall_stderr(("bash: " + args[0] + ": command not found\n").encode("utf-8"))
+        # leave closing the channel to the client, closing it here could beat the reply to the exec request
+        channel.send_exit_status(status)
+        channel.shutdown_write()
+
+    def shutdown(self):
+        self.listener.close()
+
+
+# start the server in a background thread and return it, call shutdown() to stop it
+def start_server(directory, port=0, password="arista", latency=0, rate=0, host_key=None):
+    server = SFTPTestServer(directory, port, password, latency, rate, host_key)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dir', required=False,
+                        default='.', help='Directory the server serves as /')
+    parser.add_argument('--port', required=False, type=int,
+                        default=2222, help='TCP port to listen on')
+    parser.add_argument('--password', required=False,
+                        default='arista', help='Password to accept for any username')
+    parser.add_argument('--latency', required=False, type=float,
+                        default=0, help='Round trip time to simulate in milliseconds')
+    parser.add_argument('--rate', required=False, type=float,
+                        default=0, help='Maximum bytes per second for each connection, 0 for no limit')
+    args = parser.parse_args()
+
+    server = start_server(args.dir, args.port, args.password, args.latency / 1000, args.rate)
+    print("Serving " + args.dir + " over SFTP on port " + str(args.port))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
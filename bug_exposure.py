@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+
+"""
+DESCRIPTION
+Checks every switch in ~/.eapi.conf against the bug alert database downloaded by bugalertUpdate.py
+(AlertBase-CVP.json) and writes a table of which bug alerts each switch is exposed to.
+
+'show version' is collected from all the switches at the same time (--workers at once, default
+50) over the shared eAPI connections in eapi_fleet.py. A network usually runs only a handful of
+EOS versions, so the versions are deduplicated and each distinct version is checked against the
+bug alert index (see alertbase.py) once, however many switches run it. The time taken to check
+the switches depends on the number of versions rather than the number of switches.
+
+The table is written to --output, as CSV if the filename ends in .csv and as JSON otherwise. The
+CSV has a row per switch with the number of bug alerts and CVEs and the bug alert ids. The JSON
+has the version and number of bug alerts and CVEs for each switch, and the details of the bug
+alerts for each version once rather than repeated for every switch running it. Switches which
+can't be reached are included with the error and the script exits with status 1.
+
+If there's no AlertBase-CVP.json in the current directory the last one downloaded into the
+artefact store by bugalertUpdate.py is used.
+
+Run the script using the following:
+./bug_exposure.py --output exposure.csv [--alertbase AlertBase-CVP.json] [--role leaf] [--site dc1] [--tag prod]
+
+This script needs eapi_fleet.py, eapi_inventory.py, alertbase.py and artefact_store.py in the same
+directory.
+"""
+__author__ = 'marayson'
+
+import argparse
+import collections
+import csv
+import json
+import os
+import ssl
+import sys
+import time
+from eapi_fleet import load_hosts, ConnectionPool, run_on_switches
+from alertbase import AlertIndex, parse_version
+from artefact_store import ArtefactStore, STORE_DIR
+
+try:
+  _create_unverified_https_context = ssl._create_unverified_context
+except AttributeError:
+# Legacy Python that doesn't verify HTTPS certificates by default
+  pass
+else:
+# Handle target environment that doesn't support HTTPS verification
+  ssl._create_default_https_context = _create_unverified_https_context
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--output', required=False,
+                    default='exposure.json', help='File to write the exposure table to, CSV if the name ends in .csv otherwise JSON')
+parser.add_argument('--alertbase', required=False,
+                    default='AlertBase-CVP.json', help='Bug alert database downloaded by bugalertUpdate.py')
+parser.add_argument('--store', required=False,
+                    default=STORE_DIR, help='Artefact store to find the bug alert database in if --alertbase does not exist')
+parser.add_argument('--role', required=False,
+                    default='', help='Only check switches with this role in eapi.conf, e.g. leaf or spine')
+parser.add_argument('--site', required=False,
+                    default='', help='Only check switches with this site in eapi.conf')
+parser.add_argument('--tag', required=False, action='append',
+                    default=[], help='Only check switches with this tag in eapi.conf, repeat --tag to require several tags')
+parser.add_argument('--workers', required=False, type=int,
+                    default=50, help='Number of switches to collect the version from in parallel')
+parser.add_argument('--timeout', required=False, type=int,
+                    default=60, help='Timeout in seconds for the eAPI connection to each switch')
+
+args = parser.parse_args()
+
+output = args.output
+alertbase = args.alertbase
+role = args.role
+site = args.site
+tags = args.tag
+workers = args.workers
+timeout = args.timeout
+
+if not os.path.isfile(alertbase):
+    stored = ArtefactStore(args.store).lookup(os.path.basename(alertbase))
+    if stored is None:
+        print(alertbase + " not found, run bugalertUpdate.py with --downloadonly to download it")
+        sys.exit(1)
+    alertbase = stored
+
+start_time = time.time()
+
+# index the bug alert database before contacting any switches so a bad file is found straight away
+index = AlertIndex.from_file(alertbase)
+
+hosts = load_hosts(role=role, site=site, tags=tags)
+pool = ConnectionPool(timeout=timeout)
+
+# run 'show version' on a single switch and return the parts of it needed for the table
+def get_version(x):
+    switch = pool.get(x)
+    result = switch.enable("show version")[0]['result']
+    return {'version': result['version'], 'model': result.get('modelName', '')}
+
+collect_start = time.time()
+results, failed = run_on_switches(get_version, hosts, workers)
+pool.close()
+collect_time = time.time() - collect_start
+
+# each distinct version is only checked against the index once, a version which can't be parsed is reported
+# against the switches running it rather than stopping the run
+check_start = time.time()
+versions = set()
+for x in results:
+    if parse_version(results[x]['version']) is None:
+        failed[x] = "unrecognised EOS version " + results[x]['version']
+    else:
+        versions.add(results[x]['version'])
+affected = index.affected_versions(versions)
+check_time = time.time() - check_start
+
+# the counts and the list of bug alert ids are worked out once for each version and shared by all the switches
+# running it
+summary = {}
+for version in affected:
+    summary[version] = {'alerts': len(affected[version]), 'cves': len([bug for bug in affected[version] if bug.get('cve')]),
+                        'alert_ids': ' '.join(str(bug['id']) for bug in affected[version])}
+
+rows = []
+for x in hosts:
+    row = {'switch': x, 'version': '', 'model': '', 'alerts': 0, 'cves': 0, 'error': failed.get(x, '')}
+    if x in results:
+        row['version'] = results[x]['version']
+        row['model'] = results[x]['model']
+    if row['version'] in summary:
+        row['alerts'] = summary[row['version']]['alerts']
+        row['cves'] = summary[row['version']]['cves']
+    rows.append(row)
+
+with open(output + '.tmp', 'w', newline='') as f:
+    if output.lower().endswith('.csv'):
+        writer = csv.writer(f)
+        writer.writerow(['switch', 'version', 'model', 'alerts', 'cves', 'alert_ids', 'error'])
+        for row in rows:
+            alert_ids = summary[row['version']]['alert_ids'] if row['version'] in summary else ''
+            writer.writerow([row['switch'], row['version'], row['model'], row['alerts'], row['cves'], alert_ids, row['error']])
+    else:
+        json.dump({'alertbase': os.path.abspath(alertbase), 'switches': rows,
+                   'versions': {version: affected[version] for version in sorted(affected, key=parse_version)}}, f, indent=2)
+os.replace(output + '.tmp', output)
+
+print("\nChecked " + str(len(hosts) - len(failed)) + " of " + str(len(hosts)) + " switches running " + str(len(versions)) +
+      " EOS versions in %.2f seconds (%.2f seconds collecting versions, %.2f seconds checking them)" %
+      (time.time() - start_time, collect_time, check_time))
+counts = collections.Counter(row['version'] for row in rows)
+for version in sorted(affected, key=parse_version):
+    print("  " + version + " - " + str(counts[version]) + " switches, " + str(len(affected[version])) + " bug alerts")
+print("Exposure table written to " + output)
+if failed:
+    print("The following switches failed:")
+    for x in sorted(failed):
+        print("  " + x + " - " + failed[x])
+    sys.exit(1)
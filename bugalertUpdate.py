@@ -38,18 +38,56 @@ A Python script for updating the AlertBase.json file on CVP when the CVP cannot
 the internet directly but a jump host is available which can access the internet and CVP.
 Script can be run manually, or using a scheduler to automatically check www.arista.com
 for database updates for the CVP Bugalerts feature. A local copy of the AlertBase-CVP.json
-file will be left in the directory with the script, it is recommended to leave this file in
-place as the script will compare this local copy to the latest downloaded one and if they are
-the same then no further action will be taken. The script can also be used to just download 
-the latest version of the file without uploading to CVP using the --downloadonly option.
+file will be left in the directory with the script. Each version of the file downloaded is kept
+in the artefact store shared with eos_download.py (~/.arista_artefacts by default, change with
+--store) and if the latest downloaded one is the same as the last one stored then no further
+action will be taken, whichever directory the script was run from. The script can also be used
+to just download the latest version of the file without uploading to CVP using the
+--downloadonly option.
+
+So a scheduled run costs almost nothing when there's no new version of the file, the ETag and
+Last-Modified arista.com sent with the last download are sent back so it can answer that the file
+hasn't changed rather than sending it again, and the file is asked for gzip compressed. If the
+whole file is sent anyway, the generation id (genId) at the start of it is compared with the last
+download's and the download is stopped straight away if they're the same. The file is written to
+disk with its checksum worked out as it arrives, and the ETag, genId and checksum are kept in
+~/.bugalertUpdate.state for the next run.
+
+Use --eos to list the bug alerts which affect one or more versions of EOS, e.g. --eos 4.28.3M,4.27.2F.
+The bug alert database is read a bug alert at a time into an index grouped by release train
+(see alertbase.py) and all the versions are checked against it in one go.
+
+More than one CVP cluster can be updated by repeating --cvp, separating the IP addresses with
+commas or listing them in a file with --cvp_list (one CVP server per line, optionally followed
+by its root password if it's different to --rootpw). The file is downloaded once and pushed to
+all the clusters at the same time (--workers at once, default 20), with the result for each
+cluster written to the log. The version of the file on each cluster is recorded in
+~/.bugalertUpdate.state, so a cluster which failed or has just been added is updated on the next
+run even if there's no new version of the file. The version of CVP and the number of nodes in each
+cluster are found with one command when it's first updated and kept in the state file, and are
+used for --cvp_cache_ttl hours (default 24) before being checked again, or straight away if an
+update fails or any of the nodes weren't Ready.
+
+As well as the text log in bugalertUpdate.log, each run appends a line of JSON to
+bugalertUpdate.jsonl (change with --run_log) with how long each phase took (download, compare and
+for each CVP cluster connect, upload, install, distribute to the other nodes and restart), the
+bytes downloaded and uploaded and the outcome. run_log_summary.py prints the 50th and 95th
+percentile time of each phase across the runs.
 To learn more about BugAlerts see: https://eos.arista.com/eos-4-17-0f/bug-alerts/
 
 INSTALLATION
 1. python3 needs to be installed on the jump host
-2. pip3 install scp paramiko
-3. wget https://github.com/Sparky-python/Arista_scripts/blob/master/bugalertUpdate.py
+2. pip3 install paramiko tqdm requests
+3. wget https://github.com/Sparky-python/Arista_scripts/blob/master/bugalertUpdate.py,
+https://github.com/Sparky-python/Arista_scripts/blob/master/artefact_store.py,
+https://github.com/Sparky-python/Arista_scripts/blob/master/cvp_ssh.py,
+https://github.com/Sparky-python/Arista_scripts/blob/master/downloader.py,
+https://github.com/Sparky-python/Arista_scripts/blob/master/alertbase.py and
+https://github.com/Sparky-python/Arista_scripts/blob/master/run_log.py into the same folder
 4. run the script with.. ./bugalertUpdate.py --api <BUGALERTS TOKEN FROM ARISTA.COM> [--cvp 
-<CVP SERVER IP ADDRESS> --rootpw <ROOT PASSWORD OF CVP SERVER>] [--downloadonly]
+<CVP SERVER IP ADDRESS>[,<CVP SERVER IP ADDRESS>] --cvp_list <FILE> --rootpw <ROOT PASSWORD OF CVP SERVER>
+--cvp_cache_ttl <HOURS>]
+[--downloadonly] [--eos <EOS VERSION>[,<EOS VERSION>]]
 
 Credit to Corey Hinds for original script which this was based on to update BugAlerts file 
 in CVX
@@ -62,59 +100,198 @@ import warnings
 import requests
 import argparse
 import sys
-from paramiko import SSHClient
-from scp import SCPClient
-import paramiko
 import os
+import re
+import hashlib
 import time
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from artefact_store import ArtefactStore, STORE_DIR, file_checksum
+from cvp_ssh import CvpSession
+from alertbase import AlertIndex
+from run_log import RunLog
+
+# bump this if the format of the state file changes so old state files are ignored
+STATE_VERSION = 1
+
+# size of each read of the bug alert database from arista.com
+CHUNK_SIZE = 1024 * 1024
+
+# the bug alert database starts with its generation id, which changes whenever the database does, this is how far
+# into the file to look for it
+GEN_ID_SIZE = 4096
+GEN_ID_RE = re.compile(rb'\s*\{\s*"genId"\s*:\s*"?([^",}\s]+)"?\s*[,}]')
+
+
+def update_cvp(cvp, rootpw, filename, cvp_info, timings):
+   # copy the new file to CVP, move it into place and restart the bugalerts-update service, all over one SSH connection
+   # with each command finishing successfully before the next one is run. cvp_info is the CVP version and number of
+   # nodes found on an earlier run, if it's None they're found now. Each step is timed in timings, the run log entry
+   # for the cluster. Returns a description of what was updated and the cvp_info used, any failure raises an exception
+   with timings.phase('connect'):
+      cvp_session = CvpSession(cvp, "root", rootpw)
+   with cvp_session:
+      if cvp_info is None:
+         with timings.phase('probe'):
+            cvp_info = cvp_session.cvp_info()
+      # entries cached before the number of configured nodes was recorded only have the number of nodes
+      configured = cvp_info.get('configured', cvp_info['nodes'])
+      timings.set(cvp_version=cvp_info['version'], nodes=cvp_info['nodes'], configured=configured)
+      cvp_version = cvp_info['version']
+      cvp_main_version = cvp_version[0:4]
+      if (cvp_main_version == "2020") or (cvp_main_version == "2021") or (cvp_main_version == "2022"):
+         bugalerts_dir = '/cvpi/apps/bugalerts'
+      elif (cvp_main_version == "2018") or (cvp_main_version == "2019"):
+         bugalerts_dir = '/cvpi/apps/aeris/bugalerts'
+      else:
+         raise ValueError('CVP version ' + cvp_version + ' is not supported by this script')
+      with timings.phase('upload'):
+         cvp_session.put(filename, 'AlertBase-CVP.json', progress=False)
+      timings.add_bytes('upload', os.path.getsize(filename))
+      with timings.phase('install'):
+         cvp_session.run('chmod 644 AlertBase-CVP.json')
+         cvp_session.run('mv -f AlertBase-CVP.json ' + bugalerts_dir + '/AlertBase.json')
+      # on a 3 node cluster the file needs copying to the other 2 nodes as well, both copies are done at the same time.
+      # This goes by the configured nodes so it's still tried if one isn't Ready, the update fails if it can't be reached
+      if (bugalerts_dir == '/cvpi/apps/bugalerts') and (configured == 3):
+         copies = ["su cvp -c 'scp " + bugalerts_dir + "/AlertBase.json $" + node + ":" + bugalerts_dir + "/AlertBase.json'" for node in ("SECONDARY_HOSTNAME", "TERTIARY_HOSTNAME")]
+         with timings.phase('distribute'):
+            with ThreadPoolExecutor(max_workers=len(copies)) as executor:
+               list(executor.map(cvp_session.run, copies))
+         timings.add_bytes('distribute', os.path.getsize(filename) * len(copies))
+      with timings.phase('restart'):
+         cvp_session.run("su cvp -c 'cvpi stop bugalerts-update && cvpi start bugalerts-update'")
+   return "updated " + str(configured) + " node(s) (" + str(cvp_info['nodes']) + " Ready) running CVP " + cvp_version, cvp_info
+
+
+def read_cvp_list(filename, rootpw):
+   # each line of the file is a CVP server IP address or hostname, optionally followed by its root password if it's
+   # different to --rootpw, blank lines and lines starting with # are ignored
+   clusters = {}
+   with open(filename, 'r') as f:
+      for line in f:
+         fields = line.split()
+         if not fields or fields[0].startswith('#'):
+            continue
+         clusters[fields[0]] = fields[1] if len(fields) > 1 else rootpw
+   return clusters
 
 
-def remove_last_line_from_string(s):
-    return s[:s.rfind('\n')]
+def read_state(filename):
+   # the state file records the checksum of the AlertBase-CVP.json last pushed to each CVP server, and under 'feed' the
+   # checksum, ETag, Last-Modified and genId of the last one downloaded. Under 'cvp' is the version and number of nodes
+   # of each CVP server and when they were found
+   try:
+      with open(filename, 'r') as f:
+         state = json.load(f)
+   except (OSError, ValueError):
+      state = {}
+   if state.get('version') != STATE_VERSION:
+      state = {'version': STATE_VERSION, 'clusters': {}}
+   return state
 
-def is_eos_after(eos_ver, list_of_version_introduced):
-   is_after_list = []
 
-   eos_ver_list = eos_ver.split(".")
-   for y in range(len(list_of_version_introduced)):
-      list_of_version_introduced_list = list_of_version_introduced[y].split(".")
-      for x in range(len(eos_ver_list)):
-         if int(eos_ver_list[x]) < int(list_of_version_introduced_list[x]):
-            is_after_list.append(False)
-            break
-         elif int(eos_ver_list[x]) > int(list_of_version_introduced_list[x]):
-            is_after_list.append(True)
-            break
-         elif (int(eos_ver_list[x]) == int(list_of_version_introduced_list[x])) and (x == len(eos_ver_list) - 1):
-            is_after_list.append(True)
-            break
+def write_state(filename, updated, feed=None, cvp_info=None):
+   # merge in what this run updated and write to a temporary file and rename it so another run never sees a half
+   # written file. A CVP server with None for its cvp_info is removed from the cache
+   state = read_state(filename)
+   state['clusters'].update(updated)
+   if feed is not None:
+      state['feed'] = feed
+   for x, info in (cvp_info or {}).items():
+      if info is None:
+         state.get('cvp', {}).pop(x, None)
+      else:
+         state.setdefault('cvp', {})[x] = info
+   try:
+      with open(filename + '.tmp', 'w') as f:
+         json.dump(state, f)
+      os.replace(filename + '.tmp', filename)
+   except OSError:
+      pass
+
 
-   is_after = any(is_after_list)
-   return is_after
+def fetch_alertbase(url, data, feed, filename):
+   # download the bug alert database to filename, working out its checksum as it arrives rather than holding it in
+   # memory. requests asks for a gzip compressed response by default. The ETag and Last-Modified of the last download
+   # are sent so the server can answer that the file hasn't changed, and if it sends the whole file anyway the genId at
+   # the start of it is checked as soon as it arrives and the download stopped if it's the same as last time. Returns
+   # the new feed state, with 'changed' False if the file is the same as last time, and the number of bytes received
+   headers = {}
+   if feed.get('etag'):
+      headers['If-None-Match'] = feed['etag']
+   if feed.get('last_modified'):
+      headers['If-Modified-Since'] = feed['last_modified']
+   with requests.post(url, data=data, headers=headers, stream=True) as result:
+      # the request is a POST, so a server following RFC 7232 answers 412 Precondition Failed rather than 304 when
+      # the file hasn't changed
+      if result.status_code in (304, 412) and headers:
+         return dict(feed, changed=False), 0
+      result.raise_for_status()
+      new_feed = {'etag': result.headers.get('ETag'), 'last_modified': result.headers.get('Last-Modified'), 'changed': True}
+      head = result.raw.read(GEN_ID_SIZE, decode_content=True)
+      match = GEN_ID_RE.match(head)
+      if match:
+         new_feed['gen_id'] = match.group(1).decode('utf-8', 'replace')
+         if new_feed['gen_id'] == feed.get('gen_id') and feed.get('checksum'):
+            new_feed.update(checksum=feed['checksum'], changed=False)
+            return new_feed, result.raw.tell()
+      checksum = hashlib.sha256(head)
+      with open(filename, 'wb') as f:
+         f.write(head)
+         for block in result.iter_content(CHUNK_SIZE):
+            checksum.update(block)
+            f.write(block)
+      new_feed['checksum'] = checksum.hexdigest()
+      return new_feed, result.raw.tell()
 
-def is_cluster()
 
 warnings.filterwarnings("ignore")
 parser = argparse.ArgumentParser()
 parser.add_argument('--api', required=False,
                     default='', help='arista.com user API key')
-parser.add_argument('--cvp', required=False,
-                    default='', help='IP address of CVP server')
+parser.add_argument('--cvp', required=False, action='append',
+                    default=[], help='IP address of CVP server, repeat --cvp option or separate with commas for more than one CVP cluster')
+parser.add_argument('--cvp_list', required=False,
+                    default='', help='File listing the CVP servers to update, one per line optionally followed by its root password')
 parser.add_argument('--rootpw', required=False,
                     default='', help='Root password of CVP server')
+parser.add_argument('--workers', required=False, type=int,
+                    default=20, help='Number of CVP clusters to update at the same time')
 parser.add_argument('--downloadonly', required=False, action='store_true',
                     default='', help='Option to only download the alertbase.json file')
-parser.add_argument('--eos', required=False,
-                    default='', help="Version of EOS to check for CVE's against")
+parser.add_argument('--eos', required=False, action='append',
+                    default=[], help="Version of EOS to check for bug alerts and CVE's against, repeat --eos option or separate with commas for more than one version")
+parser.add_argument('--cvp_cache_ttl', required=False, type=float,
+                    default=24, help='Hours to keep using the CVP version and number of nodes found on an earlier run, 0 to find them every time')
+parser.add_argument('--run_log', required=False,
+                    default='bugalertUpdate.jsonl', help='File to append a JSON record of the timings and outcome of each run to, summarise it with run_log_summary.py')
+parser.add_argument('--store', required=False,
+                    default=STORE_DIR, help='Directory of the artefact store shared with eos_download.py')
+parser.add_argument('--store_size', required=False, type=float,
+                    default=20, help='Size cap for the artefact store in GB, the least recently used files are removed above this')
 
 args = parser.parse_args()
 
 api = args.api
-cvp = args.cvp
 rootpw = args.rootpw
+workers = args.workers
+cvp_cache_ttl = args.cvp_cache_ttl
 downloadonly = args.downloadonly
-eos = args.eos
+eos = list(dict.fromkeys(x.strip() for y in args.eos for x in y.split(',') if x.strip() != ''))
+store = ArtefactStore(args.store, args.store_size * 1024 * 1024 * 1024)
+
+# the CVP clusters to update, keyed on IP address with the root password for each
+clusters = {}
+for cvp in args.cvp:
+   for x in cvp.split(','):
+      if x.strip() != '':
+         clusters[x.strip()] = rootpw
+if args.cvp_list != '':
+   clusters.update(read_cvp_list(args.cvp_list, rootpw))
+if not downloadonly and not clusters:
+   print ("\nPlease specify the CVP server to update with the --cvp or --cvp_list option, or use --downloadonly")
+   sys.exit()
 
 
 creds = (base64.b64encode(api.encode())).decode("utf-8")
@@ -125,97 +302,132 @@ warnings.filterwarnings("ignore")
 
 jsonpost = {'token_auth': creds, 'file_version':'2'}
 
-result = requests.post(url, data=json.dumps(jsonpost))
-web_data = json.loads(result.text)
-web_data_final = result.text
-split_web_data = web_data_final.splitlines()
-
 alertBaseFile = 'AlertBase-CVP.json'
 logFile = 'bugalertUpdate.log'
+stateFile = os.path.join(os.path.expanduser("~"), ".bugalertUpdate.state")
+downloadFile = alertBaseFile + '.download'
 
-if not downloadonly:
-   ssh = SSHClient()
-   ssh.load_system_host_keys()
-   ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-   ssh.connect(cvp, username="root", password=rootpw)
-   ssh_shell = ssh.invoke_shell()
-   ssh_shell.send("rpm -qi cvp-base\n")
-   time.sleep(2)
-   output = ssh_shell.recv(8000)
-   output = output.decode("utf-8")
-   output = remove_last_line_from_string(output)
-   output = remove_last_line_from_string(output)
-   output = remove_last_line_from_string(output)
-   output = output[(output.index('Name')):]
-   Dict = dict((x.strip(), y.strip()) for x, y in (element.split(': ') for element in output.split('\r\n')))
-   cvp_main_version = Dict["Version"][0:4]
+# the phases of the run, the bytes moved and the outcome are recorded in the run log alongside bugalertUpdate.log
+run = RunLog('bugalertUpdate')
+run.set(clusters=len(clusters), downloadonly=bool(downloadonly))
 
 log = open(logFile, 'a+')
 log.write("\nTimestamp  --  " + (datetime.now().strftime("%m/%d/%Y, %H:%M:%S")) + "\n" + "===================================\n")
 
+# only ask arista.com whether the file has changed since the last download if that download is still in the artefact
+# store, otherwise download the whole file again
+feed = read_state(stateFile).get('feed', {})
+if feed.get('checksum') and store.get('sha256', feed['checksum']) is None:
+   feed = {}
+try:
+   with run.phase('download'):
+      feed, received = fetch_alertbase(url, json.dumps(jsonpost), feed, downloadFile)
+except (requests.exceptions.RequestException, OSError) as ERR:
+   log.write('\n Failed to download the Bug Alert Database: ' + str(ERR) + '\n')
+   log.close()
+   run.set(outcome='download_failed', error=str(ERR))
+   run.write(args.run_log)
+   print ("\nFailed to download the Bug Alert Database: " + str(ERR))
+   sys.exit(1)
+changed = feed.pop('changed')
+web_data_checksum = feed['checksum']
+run.add_bytes('download', received)
+run.set(changed=changed, checksum=web_data_checksum)
+write_state(stateFile, {}, feed)
+if changed:
+   log.write('\n Downloaded the Bug Alert Database from arista.com, ' + str(received) + ' bytes received\n')
+else:
+   log.write('\n Bug Alert Database on arista.com has not changed since the last download, ' + str(received) + ' bytes received\n')
 
-if os.path.isfile(alertBaseFile):
-   with open(alertBaseFile, 'r') as file:
-      existing_file = file.read()
-   split_existing_file = existing_file.splitlines()
-   if split_web_data[2] != split_existing_file[2]:   
-      file.close()   
-      os.remove('AlertBase-CVP.json')
+# the artefact store records the checksum of the last AlertBase-CVP.json downloaded by any run, if it's not in there
+# fall back to a local copy left by an earlier version of the script
+compare_start = time.time()
+previous = store.checksum_for(alertBaseFile)
+if previous is None and os.path.isfile(alertBaseFile):
+   previous = ('sha256', file_checksum(alertBaseFile))
+stored = store.add(downloadFile if changed else store.object_path('sha256', web_data_checksum), 'sha256', web_data_checksum, alertBaseFile)
+if os.path.isfile(downloadFile):
+   os.remove(downloadFile)
 
+if previous is not None:
+   if previous != ('sha256', web_data_checksum):
       log.write('\n Bug Alert Database out of date. Downloading update...\n')
-      alertdbfile = open(alertBaseFile, 'w')
-      alertdbfile.write(web_data_final)
-      alertdbfile.close()
+      store.export(stored, alertBaseFile)
       log.write('\n Bug Alert Database successfully created and imported\n')
-
-      if not downloadonly:
-         ssh = SSHClient()
-         ssh.load_system_host_keys()
-         ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-         ssh.connect(cvp, username="root", password=rootpw)
-         scp = SCPClient(ssh.get_transport())
-         scp.put('AlertBase-CVP.json')
-         stdin, stdout, stderr = ssh.exec_command('chmod 644 AlertBase-CVP.json')
-         if cvp_main_version == "2020" or (cvp_main_version == "2021") or (cvp_main_version == "2022"):
-            stdin, stdout, stderr = ssh.exec_command('mv -f AlertBase-CVP.json /cvpi/apps/bugalerts/AlertBase.json')
-            stdin, stdout, stderr = ssh.exec_command("su cvp -c 'scp /cvpi/apps/bugalerts/AlertBase.json $SECONDARY_HOSTNAME:/cvpi/apps/bugalerts/AlertBase.json'")
-            stdin, stdout, stderr = ssh.exec_command("su cvp -c 'scp /cvpi/apps/bugalerts/AlertBase.json $TERTIARY_HOSTNAME:/cvpi/apps/bugalerts/AlertBase.json'")
-         elif (cvp_main_version == "2018") or (cvp_main_version == "2019"): 
-            stdin, stdout, stderr = ssh.exec_command('mv -f AlertBase-CVP.json /cvpi/apps/aeris/bugalerts/AlertBase.json')
-         else:
-            log.write('\n This version of CVP is not supported by this script')
-            sys.exit()
-         stdin, stdout, stderr = ssh.exec_command('su cvp')
-         stdin, stdout, stderr = ssh.exec_command('cvpi stop bugalerts-update && cvp start bugalerts-update')
    else:
       log.write('\n No updates to Bug Alert Database file.\n')
+      if not os.path.isfile(alertBaseFile): # leave a local copy as usual if an earlier run was in another directory
+         store.export(stored, alertBaseFile)
 else:
    log.write ('\n Bug Alert Database does not exist. Downloading...\n')
-   alertdbfile = open(alertBaseFile, 'w')
-   alertdbfile.write(web_data_final)
-   alertdbfile.close()
+   store.export(stored, alertBaseFile)
    log.write('\n Bug Alert Database successfully created and imported\n')
+run.add_phase('compare', time.time() - compare_start)
+run.add_bytes('alertbase', os.path.getsize(alertBaseFile))
+
+# list the bug alerts which affect each of the EOS versions given, the database is indexed once and all the versions are
+# checked against it in one go
+if eos:
+   with run.phase('eos'):
+      affected = AlertIndex.from_file(alertBaseFile).affected_versions(eos)
+   for version in eos:
+      print ("\nEOS " + version + " is affected by " + str(len(affected[version])) + " bug alerts")
+      for bug in affected[version]:
+         print ("   " + str(bug['id']) + "  " + str(bug.get('severity', '')) + "  " + str(bug.get('cve', '')) + "  " + str(bug.get('summary', '')))
+
+# the file is pushed to every CVP cluster which doesn't have this version of it yet, which includes any cluster where
+# the last update failed or which has just been added, all the clusters are updated at the same time
+failed = {}
+if not downloadonly:
+   state = read_state(stateFile)
+   targets = [x for x in clusters if state['clusters'].get(x) != web_data_checksum]
+   updated = {}
+   cvp_info = {}
+   if targets:
+      # the CVP version and number of nodes found on an earlier run are used until they're older than --cvp_cache_ttl
+      cached = {}
+      for x in targets:
+         info = state.get('cvp', {}).get(x)
+         if info and time.time() - info['checked'] < cvp_cache_ttl * 3600:
+            cached[x] = info
+      with run.phase('update'), ThreadPoolExecutor(max_workers=max(min(workers, len(targets)), 1)) as executor:
+         futures = {}
+         for x in targets:
+            futures[executor.submit(update_cvp, x, clusters[x], alertBaseFile, cached.get(x), run.target(x))] = x
+         for future in as_completed(futures):
+            x = futures[future]
+            try:
+               message, info = future.result()
+               log.write('\n CVP ' + x + ' - ' + message + '\n')
+               run.target(x).set(outcome='updated')
+               updated[x] = web_data_checksum
+               # a cluster with nodes which aren't Ready is checked again on the next run rather than cached
+               if info['nodes'] < info.get('configured', info['nodes']):
+                  cvp_info[x] = None
+               else:
+                  cvp_info[x] = dict(info, checked=info.get('checked', time.time()))
+            except Exception as ERR:
+               log.write('\n CVP ' + x + ' - failed to update: ' + str(ERR) + '\n')
+               run.target(x).set(outcome='failed', error=str(ERR))
+               failed[x] = str(ERR)
+               # find the version and nodes again next time in case they've changed, e.g. CVP has been upgraded
+               cvp_info[x] = None
+      write_state(stateFile, updated, cvp_info=cvp_info)
+   for x in clusters:
+      if x not in targets:
+         log.write('\n CVP ' + x + ' - already up to date\n')
+         run.target(x).set(outcome='up_to_date')
 
-   if not downloadonly:
-      ssh = SSHClient()
-      ssh.load_system_host_keys()
-      ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-      ssh.connect(cvp, username="root", password=rootpw)
-      scp = SCPClient(ssh.get_transport())
-      scp.put('AlertBase-CVP.json')
-      stdin, stdout, stderr = ssh.exec_command('chmod 644 AlertBase-CVP.json')
-      if (cvp_main_version == "2020") or (cvp_main_version == "2021") or (cvp_main_version == "2022"):
-         stdin, stdout, stderr = ssh.exec_command('mv -f AlertBase-CVP.json /cvpi/apps/bugalerts/AlertBase.json')
-         stdin, stdout, stderr = ssh.exec_command('kubectl get nodes | grep Ready | wc -l')
-         if stdout == "3":
-            stdin, stdout, stderr = ssh.exec_command("su cvp -c 'scp /cvpi/apps/bugalerts/AlertBase.json $SECONDARY_HOSTNAME:/cvpi/apps/bugalerts/AlertBase.json'")
-            stdin, stdout, stderr = ssh.exec_command("su cvp -c 'scp /cvpi/apps/bugalerts/AlertBase.json $TERTIARY_HOSTNAME:/cvpi/apps/bugalerts/AlertBase.json'")
-      elif (cvp_main_version == "2018") or (cvp_main_version == "2019"): 
-         stdin, stdout, stderr = ssh.exec_command('mv -f AlertBase-CVP.json /cvpi/apps/aeris/bugalerts/AlertBase.json')
-      else:
-         log.write('\n This version of CVP is not supported by this script')
-         sys.exit()
-      stdin, stdout, stderr = ssh.exec_command('su cvp')
-      stdin, stdout, stderr = ssh.exec_command('cvpi stop bugalerts-update && cvp start bugalerts-update')
-   
 log.close()
+if failed:
+   run.set(outcome='failed')
+elif not downloadonly and updated:
+   run.set(outcome='updated')
+else:
+   run.set(outcome='downloaded' if changed else 'unchanged')
+run.write(args.run_log)
+if failed:
+   print ("\nFailed to update " + str(len(failed)) + " of " + str(len(clusters)) + " CVP clusters, see " + logFile)
+   for x in sorted(failed):
+      print (x + " - " + failed[x])
+   sys.exit(1)
@@ -9,13 +9,40 @@ Run the script using the following:
 
 This example will try to connect to all IP's from 192.168.1.1 to 192.168.1.20
 
+A whole management subnet can be given instead of --addr and --num:
+.\create_eapi_conf.py --subnet 192.168.0.0/22 --user cvpadmin --passwd arista123
+
+Each address is first checked to see if anything is listening on TCP port 443, which is quick
+and done for many addresses in parallel (--workers, default 100), and only the addresses which
+answer are then asked for their hostname over eAPI.
+
+If the eapi.conf file already exists, use --update to refresh it rather than starting again.
+Only the addresses which are new, couldn't be connected to last time or haven't been checked for
+longer than --ttl seconds are probed. New switches are added to the end of the file and a switch
+whose hostname has changed has its connection renamed, everything else in the file (comments,
+the [DEFAULT] section, other sections and any settings which have been added by hand) is left
+exactly as it is, and the new file is swapped in once it's complete. If a switch reports a
+hostname which is already used by another connection a warning is printed and the existing
+connection is left alone. The
+time each address was last checked is kept in a .eapi.conf.sweep file next to eapi.conf.
+
 """
 __author__ = 'marayson'
 
 import argparse
 import ssl
 import socket, struct
+import sys
+import os
+import json
+import time
+import re
+import ipaddress
+import http.client
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from jsonrpclib import Server
+from jsonrpclib.jsonrpc import ProtocolError
+from eapi_inventory import parse_eapi_conf
 
 try:
   _create_unverified_https_context = ssl._create_unverified_context
@@ -28,14 +55,24 @@ else:
 
 
 parser = argparse.ArgumentParser()
-parser.add_argument('--addr', required=True,
+parser.add_argument('--addr', required=False,
                     default='', help='First management IP address in range')
-parser.add_argument('--num', required=True,
+parser.add_argument('--num', required=False,
                     default='', help='Number of addresses to try from first IP address')  
+parser.add_argument('--subnet', required=False,
+                    default='', help='Management subnet to try all the addresses in, e.g. 192.168.0.0/22, instead of --addr and --num')
 parser.add_argument('--user', required=True,
                     default='', help='Username to access the switches')
 parser.add_argument('--passwd', required=True,
                     default='', help='Password to access the switches')  
+parser.add_argument('--workers', required=False, type=int,
+                    default=100, help='Number of addresses to check in parallel')
+parser.add_argument('--tcp_timeout', required=False, type=float,
+                    default=1, help='Seconds to wait for TCP port 443 to answer on each address')
+parser.add_argument('--update', required=False, action='store_true',
+                    help='Update an existing eapi.conf file, only probing addresses which are new, were unreachable last time or are older than --ttl')
+parser.add_argument('--ttl', required=False, type=int,
+                    default=86400, help='With --update, addresses which were last checked longer ago than this many seconds are probed again')
 
 
 args = parser.parse_args()
@@ -44,6 +81,14 @@ addr = args.addr
 num = args.num
 user = args.user
 passwd = args.passwd
+subnet = args.subnet
+workers = args.workers
+tcp_timeout = args.tcp_timeout
+update = args.update
+ttl = args.ttl
+
+if not subnet and not (addr and num):
+    parser.error("please specify either --subnet or both --addr and --num")
 
 def ip2long(ip):
     """
@@ -67,32 +112,190 @@ def getNextIPAddress(ip):
     ip = long2ip(ip_address_long)
     return ip
 
+def is_port_open(ip, port=443):
+    """
+    Quick check to see if anything is listening on the port before trying eAPI
+    """
+    try:
+        with socket.create_connection((ip, port), timeout=tcp_timeout):
+            return True
+    except socket.error:
+        return False
+
+def get_hostname(ip):
+    """
+    Returns the hostname of the switch using eAPI, or None if it can't be reached or doesn't
+    answer, e.g. because it has different credentials or isn't a switch. One address failing
+    mustn't stop the rest of the sweep
+    """
+    api_url = "https://" + user + ":" + passwd + "@" + ip + "/command-api"
+    switch = Server(api_url)
+    try:
+        response = switch.runCmds(1, ["show hostname"])
+        return response[0]["hostname"]
+    except (socket.error, ssl.SSLError, http.client.HTTPException, ProtocolError) as ERR:
+        return None
+    except (ValueError, KeyError, IndexError, TypeError) as ERR:
+        # something other than a switch answering on 443, e.g. the web page of a PDU or BMC
+        return None
+
+def probe(ip):
+    """
+    Returns the hostname of the switch at the address, checking the port is open first
+    """
+    if not is_port_open(ip):
+        return None
+    return get_hostname(ip)
+
+def sweep(addresses, workers):
+    """
+    Probes all the addresses in parallel and returns a dictionary of the hostname found at each
+    address, None for the addresses which couldn't be connected to
+    """
+    hostnames = {}
+    found = 0
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = {}
+        for ip in addresses:
+            futures[executor.submit(probe, ip)] = ip
+        for future in as_completed(futures):
+            hostnames[futures[future]] = future.result()
+            if hostnames[futures[future]]:
+                found += 1
+            sys.stdout.write('\rChecked %d of %d addresses, found %d switches' % (len(hostnames), len(addresses), found))
+            sys.stdout.flush()
+    print()
+    return hostnames
+
+def write_eapi_conf(filename, renames, new_connections):
+    """
+    Writes the eapi.conf file with the connections in renames given their new names and the
+    new_connections added at the end. The existing file is edited line by line rather than
+    read in and written out again, so everything else in it (comments, the [DEFAULT] section,
+    other sections and settings added by hand) is left exactly as it is. The file is written to
+    a temporary file first and then renamed so it's never left half written, and is only
+    readable by the user as it holds the passwords
+    """
+    lines = []
+    if os.path.exists(filename):
+        with open(filename, 'r') as file_object:
+            lines = file_object.readlines()
+    for n, line in enumerate(lines):
+        match = SECTION_RE.match(line)
+        if match and match.group(1) in renames:
+            lines[n] = "[connection:" + renames[match.group(1)] + "]\n"
+    if lines and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    for hostname in new_connections:
+        if lines and lines[-1].strip():
+            lines.append("\n")
+        lines.append("[connection:" + hostname + "]\n")
+        for key in new_connections[hostname]:
+            lines.append(key + ": " + new_connections[hostname][key] + "\n")
+    fd = os.open(filename + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as file_object:
+        file_object.writelines(lines)
+    os.replace(filename + ".tmp", filename)
+
+SECTION_RE = re.compile(r'^\s*\[connection:(.+)\]\s*$')
+
+def load_sweep_state(filename):
+    """
+    Returns the hostname found at each address on previous runs (None if it couldn't be
+    connected to) and the time it was checked
+    """
+    try:
+        with open(filename, 'r') as file_object:
+            return json.load(file_object)
+    except (OSError, ValueError):
+        return {}
+
+def save_sweep_state(filename, state):
+    with open(filename + ".tmp", 'w') as file_object:
+        json.dump(state, file_object, indent=2)
+    os.replace(filename + ".tmp", filename)
+
+def needs_probe(ip, state, now):
+    """
+    An address needs probing if it's never been checked, couldn't be connected to last time or
+    was last checked longer ago than the ttl
+    """
+    if ip not in state:
+        return True
+    return state[ip]["hostname"] is None or now - state[ip]["checked"] > ttl
+
 # Find the home directory where the .eap.conf file is located
 from os.path import expanduser
 home = expanduser("~")
-hosts = []
-n = 1
-config_list = []
+eapi_conf = home + "/.eapi.conf"
+sweep_file = home + "/.eapi.conf.sweep"
 socket.setdefaulttimeout(3)
 
-file_object = open(home + "/.eapi.conf", 'x')
+if os.path.exists(eapi_conf) and not update:
+    print(eapi_conf + " already exists, use --update to refresh it")
+    sys.exit(1)
 
-current_ip = addr
+# build the list of addresses to try, either every host address in the subnet or --num addresses
+# counting up from --addr
+if subnet:
+    addresses = [str(ip) for ip in ipaddress.ip_network(subnet, strict=False).hosts()]
+else:
+    addresses = []
+    current_ip = addr
+    for i in range(int(num)):
+        addresses.append(current_ip)
+        current_ip = getNextIPAddress(current_ip)
 
-for i in range(int(num)):
-    api_url = "https://" + user + ":" + passwd + "@" + current_ip + "/command-api"
-    switch = Server(api_url)
-    try:
-        response = switch.runCmds(1, ["show hostname"])
-        hostname = response[0]["hostname"]
-        file_object.write("[connection:" + hostname + "]\n")
-        file_object.write("host: " + current_ip + "\n")
-        file_object.write("username: " + user + "\n")
-        file_object.write("password: " + passwd + "\n")
-        file_object.write("transport: https\n")
-        file_object.write("\n")
-    except socket.error as ERR:
-        print("Can't connect to " + current_ip)
-    current_ip = getNextIPAddress(current_ip)
-
-file_object.close
+connections = {}
+state = {}
+now = time.time()
+if update:
+    connections = parse_eapi_conf(eapi_conf)
+    state = load_sweep_state(sweep_file)
+    # switches already in eapi.conf from before the sweep state was kept count as checked when
+    # the file was last written
+    if os.path.exists(eapi_conf):
+        for hostname in connections:
+            ip = connections[hostname]["host"]
+            if ip not in state:
+                state[ip] = {"hostname": hostname, "checked": os.path.getmtime(eapi_conf)}
+
+to_probe = [ip for ip in addresses if needs_probe(ip, state, now)]
+if update:
+    print("Probing " + str(len(to_probe)) + " of " + str(len(addresses)) + " addresses")
+
+hostnames = sweep(to_probe, workers)
+
+# add the switches to eapi.conf in address order, for a switch which is already in the file only the
+# connection name is updated if the hostname has changed, the other settings are kept. A hostname
+# which is already used by another connection is never overwritten, it's reported instead
+host_index = {}
+for hostname in connections:
+    host_index[connections[hostname]["host"]] = hostname
+names = set(connections)
+renames = {}
+new_connections = {}
+for ip in to_probe:
+    hostname = hostnames[ip]
+    state[ip] = {"hostname": hostname, "checked": now}
+    if hostname is None:
+        print("Can't connect to " + ip)
+        continue
+    old_hostname = host_index.get(ip)
+    if old_hostname == hostname:
+        continue
+    if hostname in names:
+        print("Warning: " + ip + " reports hostname " + hostname + " which is already in " + eapi_conf + ", " +
+              ("leaving it as " + old_hostname if old_hostname else "not adding it"))
+        continue
+    if old_hostname is None:
+        new_connections[hostname] = {"host": ip, "username": user, "password": passwd, "transport": "https"}
+    else:
+        # the section keeps its place in the file, each address is only probed once so it's only renamed once
+        renames[old_hostname] = hostname
+    names.discard(old_hostname)
+    names.add(hostname)
+    host_index[ip] = hostname
+
+write_eapi_conf(eapi_conf, renames, new_connections)
+save_sweep_state(sweep_file, state)
@@ -0,0 +1,266 @@
+"""
+DESCRIPTION
+Talks to a CVP server over SSH for eos_download.py and bugalertUpdate.py. A CvpSession keeps one
+SSH connection open for the whole run and opens a separate channel on it for each upload and
+each command, so uploads and commands share the one login. Commands are run with exec and their
+output and exit status are returned once they finish, rather than typing them into an
+interactive shell and waiting a fixed time for the output. The version of CVP and the number of
+nodes in the cluster are found with a single command by cvp_info().
+
+Files are uploaded over SFTP. paramiko's sftp.put() with its default settings sends 32 KB write
+requests through a 2 MB SSH window, so over a WAN link with any latency most of the time is spent
+waiting for the window to open again rather than sending data. Instead:
+
+- the SSH transport and each SFTP channel are opened with a much larger window and packet size
+- the file is written in 128 KB requests which are pipelined, i.e. sent without waiting for each
+  one to be acknowledged
+- large files are split into byte ranges which are written in parallel, each over its own SFTP
+  channel on the same SSH connection so each gets its own window
+- several files (e.g. the SWI and the TerminAttr SWIX) can be uploaded at the same time over the
+  same SSH connection
+
+If the caller knows the checksum of the file and the CVP server already has a file of the same
+size with the same checksum (worked out on the server with sha512sum or md5sum), the upload is
+skipped. After an upload the size and, if it's known, the checksum of the copy on the server are
+checked.
+
+This file needs to be kept in the same directory as the scripts which use it, along with
+downloader.py.
+"""
+__author__ = 'marayson'
+
+import os
+import re
+import shlex
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import paramiko
+from tqdm import tqdm
+
+from downloader import split_ranges
+
+# SSH window and packet size for the transport and each SFTP channel, the window is how much can
+# be sent before waiting for the server to acknowledge it so it needs to be bigger than the
+# bandwidth multiplied by the round trip time
+WINDOW_SIZE = 64 * 1024 * 1024
+MAX_PACKET_SIZE = 128 * 1024
+
+# size of each SFTP write request, OpenSSH's sftp-server accepts requests up to 256 KB
+WRITE_SIZE = 128 * 1024
+
+# size of each read from the local file
+BLOCK_SIZE = 1024 * 1024
+
+# files smaller than this aren't worth splitting up, and no range is made smaller than this
+MIN_SEGMENT_SIZE = 32 * 1024 * 1024
+
+# how often to send a keepalive on an idle connection, in seconds
+KEEPALIVE = 30
+
+# the programs used to work out the checksum of a file on the server for each algorithm
+CHECKSUM_COMMANDS = {'md5': 'md5sum', 'sha1': 'sha1sum', 'sha256': 'sha256sum', 'sha512': 'sha512sum'}
+
+# prints the version of CVP on the first line followed by a line for each node in the cluster with its status in the
+# second column, there's no kubectl before CVP 2020 so nothing is printed for the nodes on a single node cluster
+CVP_INFO_COMMAND = "rpm -q --queryformat '%{VERSION}\\n' cvp-base && (kubectl get nodes --no-headers 2>/dev/null || true)"
+
+_cvp_version_re = re.compile(r'^\d{4}\.\d+(\.\d+)*$')
+
+# the progress bar is shared by all the streams uploading a file
+_pbar_lock = threading.Lock()
+
+
+def connect(host, username, password, port=22):
+    """
+    Open an SSH connection to the server with a large window and packet size, returns the
+    paramiko Transport
+    """
+    transport = paramiko.Transport((host, port), default_window_size=WINDOW_SIZE,
+                                   default_max_packet_size=MAX_PACKET_SIZE)
+    transport.connect(username=username, password=password)
+    return transport
+
+
+def open_sftp(transport):
+    """
+    Open a new SFTP channel on the SSH connection
+    """
+    return paramiko.SFTPClient.from_transport(transport, window_size=WINDOW_SIZE, max_packet_size=MAX_PACKET_SIZE)
+
+
+def run_command(transport, command, timeout=None):
+    """
+    Run a command on the server over a new channel on the SSH connection and wait for it to
+    finish, returns its exit status, stdout and stderr
+    """
+    channel = transport.open_session()
+    try:
+        channel.settimeout(timeout)
+        channel.exec_command(command)
+        # nothing is sent to the command, so anything waiting for input (e.g. su) sees the end
+        # of its input rather than hanging
+        channel.shutdown_write()
+        # the channel window is big enough that reading stdout before stderr can't stall
+        stdout = channel.makefile('rb').read()
+        stderr = channel.makefile_stderr('rb').read()
+        return channel.recv_exit_status(), stdout.decode('utf-8', 'replace'), stderr.decode('utf-8', 'replace')
+    finally:
+        channel.close()
+
+
+def remote_checksum(transport, path, algorithm):
+    """
+    Work out the checksum of a file on the server, returns None if the file doesn't exist or
+    the server can't work out the checksum
+    """
+    if algorithm not in CHECKSUM_COMMANDS:
+        return None
+    exit_status, stdout, stderr = run_command(transport, CHECKSUM_COMMANDS[algorithm] + ' ' + shlex.quote(path))
+    if exit_status != 0 or not stdout.split():
+        return None
+    return stdout.split()[0].lower()
+
+
+def upload_range(transport, filename, remote, start, end, pbar):
+    """
+    Write bytes start to end of the local file into the same place in the remote file, which
+    must already exist, over a new SFTP channel
+    """
+    sftp = open_sftp(transport)
+    try:
+        with open(filename, 'rb') as local, sftp.open(remote, 'r+') as f:
+            f.MAX_REQUEST_SIZE = WRITE_SIZE
+            f.set_pipelined(True)
+            local.seek(start)
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                block = local.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    raise IOError(filename + ' is shorter than expected')
+                f.write(block)
+                remaining -= len(block)
+                with _pbar_lock:
+                    pbar.update(len(block))
+            # closing the file waits for the server to acknowledge all the writes and raises any
+            # error it returned
+    finally:
+        sftp.close()
+
+
+def upload_file(transport, filename, remote, streams=4, checksum=None, progress=True):
+    """
+    Upload a local file to `remote` on the server over the SSH connection from connect(),
+    splitting it across up to `streams` SFTP channels. If checksum is given as an (algorithm,
+    hex digest) tuple, the upload is skipped if the server already has the same file and the
+    copy on the server is checked afterwards. Set progress to False to hide the progress bar,
+    e.g. when run from cron. Returns True if the file was uploaded and False if it was skipped
+    """
+    size = os.path.getsize(filename)
+    sftp = open_sftp(transport)
+    try:
+        if checksum is not None:
+            try:
+                remote_size = sftp.stat(remote).st_size
+            except IOError:
+                remote_size = None
+            if remote_size == size and remote_checksum(transport, remote, checksum[0]) == checksum[1].lower():
+                print(filename + " is already on the CVP server, not uploading it again")
+                return False
+        # create the remote file empty so each range can be written into place
+        sftp.open(remote, 'w').close()
+        pbar = tqdm(desc=os.path.basename(filename), ascii=True, unit="B", total=size, unit_scale=True, unit_divisor=1024,
+                    disable=not progress)
+        try:
+            ranges = split_ranges(size, streams, MIN_SEGMENT_SIZE) if size else []
+            with ThreadPoolExecutor(max_workers=max(len(ranges), 1)) as executor:
+                futures = [executor.submit(upload_range, transport, filename, remote, start, end, pbar) for start, end in ranges]
+                for future in futures:
+                    future.result()
+        finally:
+            pbar.close()
+        remote_size = sftp.stat(remote).st_size
+        if remote_size != size:
+            raise IOError("size mismatch in upload of " + filename + ": " + str(remote_size) + " != " + str(size))
+    finally:
+        sftp.close()
+    if checksum is not None:
+        uploaded = remote_checksum(transport, remote, checksum[0])
+        if uploaded is not None and uploaded != checksum[1].lower():
+            raise IOError("checksum mismatch in upload of " + filename + ", the copy on the CVP server is different")
+    return True
+
+
+def parse_cvp_info(output):
+    """
+    Read the version of CVP and the number of nodes from the output of CVP_INFO_COMMAND. 'nodes'
+    is the number of nodes which are Ready and 'configured' the number in the cluster, including
+    any which are NotReady
+    """
+    lines = [line.strip() for line in output.splitlines() if line.strip()]
+    if not lines or not _cvp_version_re.match(lines[0]):
+        raise ValueError("couldn't find the CVP version in " + repr(output.strip()[:100]))
+    if len(lines) == 1:
+        # no nodes listed, a single node cluster before CVP 2020
+        return {'version': lines[0], 'nodes': 1, 'configured': 1}
+    # the STATUS column can have more than one status in it, e.g. Ready,SchedulingDisabled
+    ready = [line for line in lines[1:] if len(line.split()) > 1 and 'Ready' in line.split()[1].split(',')]
+    return {'version': lines[0], 'nodes': len(ready), 'configured': len(lines) - 1}
+
+
+class CvpCommandError(Exception):
+    def __init__(self, command, exit_status, stdout, stderr):
+        Exception.__init__(self, command + " failed with exit status " + str(exit_status) + ": " + (stderr or stdout).strip())
+        self.command = command
+        self.exit_status = exit_status
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+class CvpSession(object):
+    """
+    One SSH connection to a CVP server for the length of a run. Uploads and commands each open
+    their own channel on the same connection, so there's only one TCP connection, key exchange
+    and login however many things are done, and uploads and commands can run at the same time.
+    Commands are run one at a time with exec rather than typed into an interactive shell, so
+    their output and exit status are returned as soon as they finish rather than after a fixed
+    wait
+    """
+    def __init__(self, host, username='root', password='', port=22):
+        self.host = host
+        self.transport = connect(host, username, password, port)
+        # keep the connection open while nothing is being sent, e.g. during a long download
+        self.transport.set_keepalive(KEEPALIVE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def run(self, command, check=True, timeout=None):
+        """
+        Run a command on the CVP server and return its exit status, stdout and stderr. If check
+        is True a CvpCommandError is raised if the exit status isn't 0
+        """
+        exit_status, stdout, stderr = run_command(self.transport, command, timeout)
+        if check and exit_status != 0:
+            raise CvpCommandError(command, exit_status, stdout, stderr)
+        return exit_status, stdout, stderr
+
+    def put(self, filename, remote, streams=4, checksum=None, progress=True):
+        """
+        Upload a local file to the CVP server, see upload_file()
+        """
+        return upload_file(self.transport, filename, remote, streams, checksum, progress)
+
+    def cvp_info(self):
+        """
+        Return the version of CVP installed on the server, e.g. 2021.2.0, and the number of nodes
+        in the cluster which are Ready and configured as a dictionary, all found with one command
+        """
+        return parse_cvp_info(self.run(CVP_INFO_COMMAND)[1])
+
+    def close(self):
+        self.transport.close()
@@ -1,9 +1,11 @@
 #!/usr/bin/python3
 
-import pyeapi
 import argparse
 import ssl
 import ipaddress
+import os
+import sys
+from eapi_fleet import load_hosts, ConnectionPool, run_on_switches
 
 try:
   _create_unverified_https_context = ssl._create_unverified_context
@@ -15,28 +17,63 @@ else:
   ssl._create_default_https_context = _create_unverified_https_context
 
 
-# Find the home directory where the .eap.conf file is located
-from os.path import expanduser
-home = expanduser("~")
-hosts = []
-n = 1
-hosts_file = open("hosts", 'a+')
-
-# read in the contents of the eapi.conf file and build a list of all the hostnames in a list called 'hosts'
-with open(home + "/.eapi.conf", "r") as file_object:
-    line = file_object.readline()
-    while line:
-       if "connection" in line:
-          hostname = line.lstrip('[connection:')
-          hostname = hostname.rstrip(']\n\r')
-          hosts.append(hostname)
-          line = file_object.readline()
-       else:
-          line = file_object.readline()
-for x in hosts:
-    switch = pyeapi.connect_to(x)
+parser = argparse.ArgumentParser()
+parser.add_argument('--output', required=False,
+                    default='hosts', help='File to write the ip host entries to, any existing file is replaced')
+parser.add_argument('--changes', required=False,
+                    default='', help='File to write only the changes compared to the existing output file to, as "ip host" and "no ip host" lines')
+parser.add_argument('--workers', required=False, type=int,
+                    default=20, help='Number of switches to collect the interfaces from in parallel')
+
+args = parser.parse_args()
+
+output = args.output
+changes = args.changes
+workers = args.workers
+
+# run 'show ip interface brief' on a single switch and return the ip host lines for its interfaces
+def get_host_entries(x):
+    switch = pool.get(x)
     command = switch.enable("show ip interface brief")
+    entries = []
     for key in command[0]['result']['interfaces'].keys():
-        hosts_file.write("ip host " + x + "-" + key + " " + command[0]['result']['interfaces'][key]['interfaceAddress']['ipAddr']['address'] + "\n")
-hosts_file.close()
+        entries.append("ip host " + x + "-" + key + " " + command[0]['result']['interfaces'][key]['interfaceAddress']['ipAddr']['address'])
+    return entries
+
+# write the lines to the file, writing to a temporary file and renaming it so the file is
+# never left half written
+def write_lines(filename, lines):
+    with open(filename + ".tmp", 'w') as file_object:
+        for line in lines:
+            file_object.write(line + "\n")
+    os.replace(filename + ".tmp", filename)
+
+# build a list of all the hostnames in the eapi.conf file in a list called 'hosts'
+hosts = load_hosts()
+pool = ConnectionPool()
+
+results, failed = run_on_switches(get_host_entries, hosts, workers)
+pool.close()
+if failed:
+    # don't replace the file with one that's missing the entries for some of the switches
+    for x in sorted(failed):
+        print("Failed to get the interfaces from " + x + " - " + failed[x])
+    print(output + " has not been updated")
+    sys.exit(1)
+
+# the same entry is only written once and the entries are sorted so the file is the same each
+# time it's generated from the same network
+entries = set()
+for x in results:
+    entries.update(results[x])
+
+if changes:
+    previous = set()
+    if os.path.isfile(output):
+        with open(output, 'r') as file_object:
+            previous = set(line.rstrip("\n") for line in file_object if line.strip())
+    write_lines(changes, ["no " + line for line in sorted(previous - entries)] + sorted(entries - previous))
+    print(str(len(entries - previous)) + " entries added and " + str(len(previous - entries)) + " entries removed, written to " + changes)
 
+write_lines(output, sorted(entries))
+print(str(len(entries)) + " entries from " + str(len(results)) + " switches written to " + output)
@@ -0,0 +1,423 @@
+"""
+DESCRIPTION
+Downloads large files over HTTP(S) for eos_download.py. If the server supports Range requests
+and the file is big enough, the file is split into byte ranges which are downloaded in parallel
+over separate connections and written straight into their place in the file. Otherwise the file
+is downloaded over a single connection. Either way the data is read in large blocks rather than
+a few KB at a time.
+
+The file is downloaded to a .part file next to the final file, with a .part.ranges file
+recording which byte ranges have been written so far. If the download is interrupted, running it
+again carries on from where it got to rather than starting from the beginning. Once the file is
+complete (and its checksum has been checked by eos_download.py) promote_part() renames the .part
+file to the final filename.
+
+The checksum of the file is worked out as it downloads, so it doesn't have to be read again
+afterwards. Data which arrives in order is hashed straight from memory, data from the other
+streams is hashed from the .part file as soon as everything before it has been written, which is
+normally while it's still in the page cache.
+
+When several files are downloaded at the same time, a TransferLimiter shared between them caps
+the total number of connections and the total download rate.
+
+This file needs to be kept in the same directory as eos_download.py.
+"""
+__author__ = 'marayson'
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from tqdm import tqdm
+
+# size of each read from the network and write to disk
+CHUNK_SIZE = 1024 * 1024
+
+# files smaller than this aren't worth splitting up, and no range is made smaller than this
+MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+
+# how much each stream downloads between saving its progress to the .part.ranges file
+CHECKPOINT_SIZE = 32 * 1024 * 1024
+
+# how many times a range is retried if the connection drops before giving up
+RETRIES = 3
+
+# the progress bar is shared by all the streams
+_pbar_lock = threading.Lock()
+
+
+def part_filename(filename):
+    return filename + '.part'
+
+
+def ranges_filename(filename):
+    return filename + '.part.ranges'
+
+
+def get_file_size(url):
+    """
+    Asks for the first byte of the file to find out the size of the file and whether the server
+    supports Range requests. Returns the size (None if unknown), True/False and the ETag or
+    Last-Modified header, which is used to check the file hasn't changed when resuming
+    """
+    r = requests.get(url, headers={'Range': 'bytes=0-0'}, stream=True)
+    r.raise_for_status()
+    r.close()
+    validator = r.headers.get('ETag', r.headers.get('Last-Modified'))
+    if r.status_code == 206:
+        content_range = re.match(r'bytes \d+-\d+/(\d+)', r.headers.get('Content-Range', ''))
+        if content_range:
+            return int(content_range.group(1)), True, validator
+    if 'Content-Length' in r.headers:
+        return int(r.headers['Content-Length']), False, validator
+    return None, False, validator
+
+
+def merge_ranges(ranges):
+    """
+    Sorts a list of (first byte, last byte) tuples and joins any which overlap or touch
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class PartProgress(object):
+    """
+    Keeps track of which byte ranges of the .part file have been written and saves them to the
+    .part.ranges file, so an interrupted download can carry on from where it got to
+    """
+    def __init__(self, filename, size, validator):
+        self.filename = ranges_filename(filename)
+        self.size = size
+        self.validator = validator
+        self.done = []
+        self.stopped = threading.Event()
+        self._lock = threading.Lock()
+        self.changed = threading.Condition(self._lock)
+
+    def load(self):
+        """
+        Reads the ranges already written from the .part.ranges file, returns False if there
+        isn't one or it was for a different version of the file
+        """
+        try:
+            with open(self.filename, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if saved.get('size') != self.size or saved.get('validator') != self.validator:
+            return False
+        self.done = merge_ranges([tuple(x) for x in saved.get('done', [])])
+        return True
+
+    def save(self):
+        # write to a temporary file and rename it so the file is never left half written
+        with open(self.filename + '.tmp', 'w') as f:
+            json.dump({'size': self.size, 'validator': self.validator, 'done': self.done}, f)
+        os.replace(self.filename + '.tmp', self.filename)
+
+    def add(self, start, end):
+        """
+        Records that bytes start to end (inclusive) have been written to the .part file
+        """
+        with self._lock:
+            self.done = merge_ranges(self.done + [(start, end)])
+            self.save()
+            self.changed.notify_all()
+
+    def completed(self):
+        with self._lock:
+            return sum(end - start + 1 for start, end in self.done)
+
+    def contiguous(self):
+        """
+        Returns how many bytes from the start of the file have been written without any gaps
+        """
+        with self._lock:
+            return self.contiguous_locked()
+
+    def contiguous_locked(self):
+        if self.done and self.done[0][0] == 0:
+            return self.done[0][1] + 1
+        return 0
+
+    def missing(self, start, end):
+        """
+        Returns the ranges between start and end (inclusive) which haven't been written yet
+        """
+        gaps = []
+        with self._lock:
+            for done_start, done_end in self.done:
+                if done_end < start or done_start > end:
+                    continue
+                if done_start > start:
+                    gaps.append((start, done_start - 1))
+                start = max(start, done_end + 1)
+        if start <= end:
+            gaps.append((start, end))
+        return gaps
+
+
+def split_ranges(size, streams, min_segment=MIN_SEGMENT_SIZE):
+    """
+    Splits the file into at most 'streams' byte ranges of at least min_segment bytes, returns a
+    list of (first byte, last byte) tuples
+    """
+    count = max(1, min(streams, size // min_segment))
+    segment_size = -(-size // count)
+    ranges = []
+    for start in range(0, size, segment_size):
+        ranges.append((start, min(start + segment_size, size) - 1))
+    return ranges
+
+
+class ChecksumTracker(object):
+    """
+    Works out the checksum of the file while it downloads. The hash has to be fed the file in
+    order, so data written at the current hash position is hashed straight away and anything
+    written further on is read back from the .part file by follow() once the gap before it has
+    been filled
+    """
+    def __init__(self, algorithm, filename):
+        self.hash = hashlib.new(algorithm)
+        self.filename = filename
+        self.position = 0
+        self._lock = threading.Lock()
+
+    def update(self, start, data):
+        """
+        Called with each chunk as it's written at offset start
+        """
+        with self._lock:
+            if start == self.position:
+                self.hash.update(data)
+                self.position += len(data)
+
+    def catch_up(self, progress):
+        """
+        Hashes any data in the .part file which has been saved by progress and follows on from
+        the current hash position
+        """
+        with self._lock:
+            end = progress.contiguous()
+            if end <= self.position:
+                return
+            with open(self.filename, 'rb') as f:
+                f.seek(self.position)
+                while self.position < end:
+                    block = f.read(min(CHUNK_SIZE, end - self.position))
+                    if not block:
+                        break
+                    self.hash.update(block)
+                    self.position += len(block)
+
+    def follow(self, progress):
+        """
+        Runs in its own thread while the streams download, hashing the data they've saved as
+        soon as everything before it has been saved
+        """
+        while self.position < progress.size and not progress.stopped.is_set():
+            with progress.changed:
+                if progress.contiguous_locked() <= self.position:
+                    progress.changed.wait(1)
+            self.catch_up(progress)
+
+    def hexdigest(self):
+        with self._lock:
+            return self.hash.hexdigest()
+
+
+class TransferLimiter(object):
+    """
+    Shared by all the downloads in a run to cap the total number of connections open at once and
+    the total download rate in bytes per second, 0 means no limit. Use it with 'with' around each
+    connection and call throttle() with each chunk received
+    """
+    def __init__(self, connections=0, rate=0):
+        self.connections = threading.BoundedSemaphore(connections) if connections else None
+        self.rate = rate
+        self._next = time.time()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        if self.connections:
+            self.connections.acquire()
+        return self
+
+    def __exit__(self, *args):
+        if self.connections:
+            self.connections.release()
+
+    def throttle(self, size):
+        """
+        Waits for as long as it takes to download size bytes at the maximum rate, taking into
+        account what all the other connections have downloaded
+        """
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.time()
+            self._next = max(self._next, now) + size / self.rate
+            delay = self._next - now
+        time.sleep(delay)
+
+
+def download_range(url, filename, start, end, pbar, progress, checksum, limiter):
+    """
+    Downloads bytes start to end (inclusive) of the file and writes them at the same offset in
+    the .part file, which must already exist. Progress is saved every CHECKPOINT_SIZE bytes and
+    when the download stops, including if the connection drops
+    """
+    position = start
+    saved = start
+    with limiter, requests.get(url, headers={'Range': 'bytes=%d-%d' % (start, end)}, stream=True) as r:
+        r.raise_for_status()
+        if r.status_code != 206:
+            raise IOError("Server ignored the Range request for bytes %d-%d" % (start, end))
+        with open(filename, 'r+b') as f:
+            f.seek(start)
+            try:
+                for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                    if progress.stopped.is_set():
+                        break
+                    if chunk: # filter out keep-alive new chunks
+                        chunk = chunk[:end + 1 - position]
+                        f.write(chunk)
+                        checksum.update(position, chunk)
+                        position += len(chunk)
+                        with _pbar_lock:
+                            pbar.update(len(chunk))
+                        if position - saved >= CHECKPOINT_SIZE:
+                            f.flush()
+                            os.fsync(f.fileno())
+                            progress.add(saved, position - 1)
+                            saved = position
+                        if position > end:
+                            break
+                        limiter.throttle(len(chunk))
+            finally:
+                # only record the data once it's safely on disk
+                if position > saved:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    progress.add(saved, position - 1)
+    if position != end + 1:
+        raise IOError("Expected %d bytes for bytes %d-%d but received %d" % (end - start + 1, start, end, position - start))
+
+
+def fetch_range(url, filename, start, end, pbar, progress, checksum, limiter):
+    """
+    Downloads whatever hasn't already been written between bytes start and end, if the
+    connection drops it's retried from where it got to. It only gives up after RETRIES
+    attempts in a row which don't download anything
+    """
+    attempt = 0
+    while True:
+        remaining = progress.missing(start, end)
+        try:
+            for gap_start, gap_end in remaining:
+                download_range(url, filename, gap_start, gap_end, pbar, progress, checksum, limiter)
+            return
+        except IOError:
+            if progress.missing(start, end) != remaining:
+                attempt = 0
+            attempt += 1
+            if attempt > RETRIES or progress.stopped.is_set():
+                raise
+            time.sleep(attempt)
+
+
+def download_single(url, filename, pbar, checksum, limiter):
+    """
+    Downloads the whole file over one connection
+    """
+    with limiter, requests.get(url, stream=True) as r:
+        r.raise_for_status()
+        with open(filename, 'wb') as f:
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk: # filter out keep-alive new chunks
+                    pbar.update(len(chunk))
+                    f.write(chunk)
+                    checksum.update(checksum.position, chunk)
+                    limiter.throttle(len(chunk))
+
+
+def promote_part(filename):
+    """
+    Renames the completed .part file to the final filename and removes the .part.ranges file
+    """
+    os.replace(part_filename(filename), filename)
+    discard_part(filename)
+
+
+def discard_part(filename):
+    """
+    Removes the .part and .part.ranges files for a download, e.g. if the checksum is wrong
+    """
+    for leftover in (part_filename(filename), ranges_filename(filename), ranges_filename(filename) + '.tmp'):
+        if os.path.isfile(leftover):
+            os.remove(leftover)
+
+
+def download_file(url, filename, streams=4, promote=True, algorithm='sha512', limiter=None):
+    """
+    Helper method handling downloading large files from `url` to `filename`. If promote is False
+    the file is left as a .part file for the caller to check and pass to promote_part(). Returns
+    the name of the file the data was written to and its checksum using `algorithm` (any hashlib
+    algorithm, e.g. 'sha512' or 'md5'). Pass the same TransferLimiter to downloads running at the
+    same time to cap their total connections and download rate.
+    """
+    if limiter is None:
+        limiter = TransferLimiter()
+    part = part_filename(filename)
+    checksum = ChecksumTracker(algorithm, part)
+    size, ranges_supported, validator = get_file_size(url)
+    if not ranges_supported:
+        # the server can't send part of the file so there's no way to resume, start again
+        discard_part(filename)
+        pbar = tqdm(desc=os.path.basename(filename), unit="B", total=size, unit_scale=True, unit_divisor=1024)
+        try:
+            download_single(url, part, pbar, checksum, limiter)
+        finally:
+            pbar.close()
+    else:
+        progress = PartProgress(filename, size, validator)
+        if os.path.isfile(part) and os.path.getsize(part) == size and progress.load():
+            print("Resuming download of " + filename + " from " + str(progress.completed() * 100 // max(size, 1)) + "%")
+        else:
+            # create the file at its full size up front so each range can be written into place
+            with open(part, 'wb') as f:
+                f.truncate(size)
+            progress.save()
+        pbar = tqdm(desc=os.path.basename(filename), unit="B", total=size, initial=progress.completed(), unit_scale=True, unit_divisor=1024)
+        try:
+            ranges = split_ranges(size, streams) if size else []
+            with ThreadPoolExecutor(max_workers=len(ranges) + 1) as executor:
+                futures = [executor.submit(fetch_range, url, part, start, end, pbar, progress, checksum, limiter) for start, end in ranges]
+                executor.submit(checksum.follow, progress)
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    # e.g. Ctrl-C or a range which failed, stop the other streams so their
+                    # progress is saved and the download can be resumed later
+                    progress.stopped.set()
+                    raise
+        finally:
+            pbar.close()
+        # hash anything the streams wrote which hasn't been hashed yet
+        checksum.catch_up(progress)
+    if promote:
+        promote_part(filename)
+        return filename, checksum.hexdigest()
+    return part, checksum.hexdigest()
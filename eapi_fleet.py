@@ -0,0 +1,175 @@
+"""
+DESCRIPTION
+Shared code for the pyeapi scripts in this repository (point-to-point-addressing.py,
+dns_entries.py, run_command.py and bug_exposure.py). It loads the eapi.conf inventory once per run, keeps one eAPI
+connection open to each switch so the TCP and TLS handshakes only happen once per switch rather
+than once per command, and runs a function across the switches using a pool of worker threads.
+
+This file needs to be kept in the same directory as the scripts which use it.
+
+Example usage:
+
+from eapi_fleet import load_hosts, ConnectionPool, run_on_switches
+
+hosts = load_hosts()
+with ConnectionPool() as pool:
+    results, failed = run_on_switches(lambda x: pool.get(x).enable("show version"), hosts, 10)
+"""
+__author__ = 'marayson'
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pyeapi
+from pyeapi.eapilib import ConnectionError as EapiConnectionError
+from eapi_inventory import EAPI_CONF, load_inventory, select_hosts, connection_settings
+
+
+def load_hosts(filename=EAPI_CONF, role=None, site=None, tags=None):
+    """
+    Return a list of the switch names in the eapi.conf file, optionally only the switches with
+    the given role, site and tags
+    """
+    return select_hosts(load_inventory(filename), role, site, tags)
+
+
+def is_read_only(data):
+    """
+    Returns True if the eAPI request only has show commands in it (and enable, which pyeapi
+    adds to the start of each request), so it's safe to send again
+    """
+    try:
+        commands = json.loads(data)["params"]["cmds"]
+    except (ValueError, KeyError, TypeError):
+        return False
+    for command in commands:
+        if isinstance(command, dict):
+            command = command.get("cmd", "")
+        words = str(command).split()
+        if words != ["enable"] and (not words or words[0] != "show"):
+            return False
+    return True
+
+
+class KeepAliveTransport(object):
+    """
+    Wraps the HTTP(S) connection used by pyeapi. pyeapi closes the connection after every
+    request, this ignores that so the next request to the same switch reuses the connection
+    """
+    def __init__(self, transport):
+        self._transport = transport
+        self.reused = False
+        # whether the whole of the last request was written to the connection
+        self.sent = False
+
+    def __getattr__(self, name):
+        return getattr(self._transport, name)
+
+    def __str__(self):
+        return str(self._transport)
+
+    def putrequest(self, *args, **kwargs):
+        self.sent = False
+        return self._transport.putrequest(*args, **kwargs)
+
+    def endheaders(self, *args, **kwargs):
+        result = self._transport.endheaders(*args, **kwargs)
+        self.sent = True
+        return result
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        self.reused = False
+        self._transport.close()
+
+
+class ConnectionPool(object):
+    """
+    Keeps one pyeapi Node per switch for the length of the run. Each Node keeps its connection
+    open between requests, a Node should only be used by one thread at a time which is the case
+    when the switches are shared out with run_on_switches()
+    """
+    def __init__(self, filename=EAPI_CONF, timeout=None):
+        self.inventory = load_inventory(filename)
+        self.timeout = timeout
+        self._nodes = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get(self, name):
+        """
+        Return the Node for the switch, connecting to it if this is the first time it's used
+        """
+        with self._lock:
+            if name not in self._nodes:
+                self._nodes[name] = self._connect(name)
+            return self._nodes[name]
+
+    def _connect(self, name):
+        if name not in self.inventory:
+            raise AttributeError('connection profile not found in config')
+        kwargs = connection_settings(self.inventory[name])
+        if self.timeout is not None:
+            kwargs["timeout"] = self.timeout
+        node = pyeapi.connect(return_node=True, **kwargs)
+        connection = node.connection
+        connection.transport = KeepAliveTransport(connection.transport)
+        send = connection.send
+
+        # the switch closes connections which have been idle for a while, if a request on a
+        # connection which has already been used fails, drop it and try once more on a new one.
+        # If the request had already been written the switch may have run it and only the
+        # response was lost, so it's only sent again if it just reads from the switch, sending
+        # config twice could apply it twice
+        def send_with_retry(data):
+            try:
+                response = send(data)
+            except EapiConnectionError:
+                retry = connection.transport.reused and (not connection.transport.sent or is_read_only(data))
+                # the connection can't be used again after a failure, the next request opens a new one
+                connection.transport.shutdown()
+                if not retry:
+                    raise
+                response = send(data)
+            connection.transport.reused = True
+            return response
+
+        connection.send = send_with_retry
+        return node
+
+    def close(self):
+        """
+        Close the connections to all the switches
+        """
+        with self._lock:
+            for node in self._nodes.values():
+                node.connection.transport.shutdown()
+            self._nodes = {}
+
+
+def run_on_switches(function, switches, workers):
+    """
+    Run function(x) for each of the switches using a pool of worker threads, returns a
+    dictionary of the results and a dictionary of the errors for any switches which failed
+    """
+    results = {}
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = {}
+        for x in switches:
+            futures[executor.submit(function, x)] = x
+        for future in as_completed(futures):
+            x = futures[future]
+            try:
+                results[x] = future.result()
+            except Exception as ERR:
+                failed[x] = str(ERR)
+    return results, failed
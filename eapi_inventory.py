@@ -0,0 +1,144 @@
+"""
+DESCRIPTION
+Reads the eapi.conf file used by pyeapi into an inventory of switches for the scripts in this
+repository. As well as the connection settings, each switch can be given a role, a site and a
+comma separated list of tags which the scripts can use to pick which switches to run against,
+for example:
+
+[connection:leaf1]
+host: 10.83.30.3
+username: cvpadmin
+password: arista123
+transport: https
+role: leaf
+site: london
+tags: pod1, evpn
+
+The parsed inventory is saved to a cache file next to the eapi.conf file (.eapi.conf.cache for
+~/.eapi.conf, only readable by the user as it holds the passwords) and reused until the eapi.conf
+file is changed, so even a large inventory loads in a few milliseconds.
+
+This file needs to be kept in the same directory as the scripts which use it.
+"""
+__author__ = 'marayson'
+
+import configparser
+import errno
+import json
+import os
+
+EAPI_CONF = os.path.join(os.path.expanduser("~"), ".eapi.conf")
+
+# bump this if the format of the cache file changes so old cache files are ignored
+CACHE_VERSION = 1
+
+# the inventories already loaded by this run, keyed on filename
+_loaded = {}
+
+
+def cache_filename(filename):
+    """
+    Return the name of the cache file for an eapi.conf file, e.g. ~/.eapi.conf.cache
+    """
+    directory, basename = os.path.split(filename)
+    if not basename.startswith("."):
+        basename = "." + basename
+    return os.path.join(directory, basename + ".cache")
+
+
+def parse_eapi_conf(filename):
+    """
+    Parse the eapi.conf file and return a dictionary of the settings for each switch, keyed on
+    the connection name in the order they appear in the file
+    """
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(filename)
+    inventory = {}
+    for section in config.sections():
+        if not section.startswith("connection:"):
+            continue
+        name = section[len("connection:"):]
+        settings = dict(config.items(section))
+        # same as pyeapi, if no host is given the connection name is used
+        settings.setdefault("host", name)
+        if "tags" in settings:
+            settings["tags"] = [tag.strip() for tag in settings["tags"].split(",") if tag.strip()]
+        else:
+            settings["tags"] = []
+        inventory[name] = settings
+    return inventory
+
+
+def _file_key(filename):
+    stat = os.stat(filename)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _read_cache(filename, key):
+    try:
+        with open(cache_filename(filename), "r") as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+    if cache.get("version") != CACHE_VERSION or cache.get("key") != key:
+        return None
+    return cache["inventory"]
+
+
+def _write_cache(filename, key, inventory):
+    # write to a temporary file and rename it so another run never sees a half written cache,
+    # if the directory can't be written to the inventory just isn't cached. The cache holds the
+    # usernames and passwords from the eapi.conf file so it's only readable by the user
+    cache = cache_filename(filename)
+    try:
+        fd = os.open(cache + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as cache_file:
+            json.dump({"version": CACHE_VERSION, "key": key, "inventory": inventory}, cache_file)
+        os.replace(cache + ".tmp", cache)
+    except OSError:
+        pass
+
+
+def load_inventory(filename=EAPI_CONF):
+    """
+    Return the inventory for the eapi.conf file, using the cache file if the eapi.conf file
+    hasn't changed since it was written. Raises FileNotFoundError if the file is missing, rather
+    than carrying on with no switches
+    """
+    filename = os.path.expanduser(filename)
+    if not os.path.isfile(filename):
+        raise FileNotFoundError(errno.ENOENT, "eapi.conf file not found, create it with create_eapi_conf.py", filename)
+    key = _file_key(filename)
+    if filename in _loaded and _loaded[filename][0] == key:
+        return _loaded[filename][1]
+    inventory = _read_cache(filename, key)
+    if inventory is None:
+        inventory = parse_eapi_conf(filename)
+        _write_cache(filename, key, inventory)
+    _loaded[filename] = (key, inventory)
+    return inventory
+
+
+def select_hosts(inventory, role=None, site=None, tags=None):
+    """
+    Return the names of the switches in the inventory which match the given role and site and
+    have all the given tags, leaving an option as None means it isn't used to filter
+    """
+    hosts = []
+    for name, settings in inventory.items():
+        if role and settings.get("role", "").lower() != role.lower():
+            continue
+        if site and settings.get("site", "").lower() != site.lower():
+            continue
+        if tags and not set(tags).issubset(settings["tags"]):
+            continue
+        hosts.append(name)
+    return hosts
+
+
+def connection_settings(settings):
+    """
+    Return the settings for a switch with the inventory only attributes removed so they can be
+    passed to pyeapi.connect()
+    """
+    return {key: value for key, value in settings.items() if key not in ("role", "site", "tags")}
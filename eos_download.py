@@ -62,11 +62,38 @@ If running the script on a non-shared environment, the user's API key could be h
 the script to save having to use it on the command line. To do this, enter the API key as the
 default value in the argparse section and change the required value to False.
 
+Images are downloaded to a .part file which is only renamed once the checksum is correct. If a
+download is interrupted, re-running the same command carries on from where it got to. A local
+copy of an image is only reused if it's the same size as the image on arista.com.
+
+The arista.com folder tree is saved in an index file (~/.eos_download.index) which is used for a
+day, or until an image can't be found in it. Use --refresh_index to fetch it again straight away.
+The session code and download links are saved in ~/.eos_download.state and reused until they
+expire.
+
+Downloaded files are kept in an artefact store (~/.arista_artefacts by default, change with
+--store) shared with bugalertUpdate.py and other runs of the script, so an image already
+downloaded by an earlier run in any directory is copied from the store rather than downloaded
+again. --store_size caps the size of the store in GB (default 20).
+
+When more than one --ver is given the images are downloaded at the same time, --parallel sets how
+many at once, --max_connections caps the total connections and --max_rate the total download rate
+in MB/s. Each image is checked and uploaded to CVP as soon as it's downloaded.
+
+Images are uploaded to CVP and imported into a bundle over one SSH connection, with a large
+window, pipelined SFTP writes and each large image split across several SFTP channels
+(--upload_streams, default 4). The images for a bundle are uploaded at the same time. If CVP
+already has an image with the same checksum it isn't uploaded again.
+
 
 INSTALLATION
 1. python3 needs to be installed on the host
-2. pip3 install scp paramiko tqdm requests
-3. wget https://github.com/Sparky-python/Arista_scripts/blob/master/eos_download.py
+2. pip3 install paramiko tqdm requests
+3. wget https://github.com/Sparky-python/Arista_scripts/blob/master/eos_download.py and
+https://github.com/Sparky-python/Arista_scripts/blob/master/downloader.py,
+https://github.com/Sparky-python/Arista_scripts/blob/master/arista_api.py,
+https://github.com/Sparky-python/Arista_scripts/blob/master/artefact_store.py and
+https://github.com/Sparky-python/Arista_scripts/blob/master/cvp_ssh.py into the same folder
 4. Run the script using the following: .\eos_download.py --api {API TOKEN} --ver 
 {EOS VERSION|TERMINATTR VERSION|CVP VERSION} [--ver {EOS VERSION|TERMINATTR VERSION|CVP VERSION}] [--img {INT|64|2GB|2GB-INT|vEOS|vEOS-lab|vEOS-lab-swi|vEOS64-lab|cEOS|cEOS64|source|ova|kvm|rpm|upgrade|ipam|remedy|cloudbuilder} --cvp {CVP IP ADDRESS} --rootpw {ROOT PASSWORD} --cvp_user 
 {GUI CVP USERNAME} --cvp_passwd {GUI CVP PASSWORD} --eve --overwrite --disable_ztp] 
@@ -75,73 +102,23 @@ INSTALLATION
 """
 __author__ = 'marayson'
 
-import base64
-import xml.etree.ElementTree as ET
 import sys
-import requests
 import argparse
-import json
 import warnings
-import urllib.request
-from tqdm import tqdm
-from paramiko import SSHClient
-from scp import SCPClient
-import paramiko
 import os
 import os.path
 import re
-import time
-import hashlib
-
-
-# part of progress bar code
-def viewBar(a,b):
-    # original version
-    res = a/int(b)*100
-    sys.stdout.write('\rComplete precent: %.2f %%' % (res))
-    sys.stdout.flush()
-
-# part of progress bar code
-def tqdmWrapViewBar(*args, **kwargs):
-    try:
-        from tqdm import tqdm
-    except ImportError:
-        # tqdm not installed - construct and return dummy/basic versions
-        class Foo():
-            @classmethod
-            def close(*c):
-                pass
-        return viewBar, Foo
-    else:
-        pbar = tqdm(*args, **kwargs)  # make a progressbar
-        last = [0]  # last known iteration, start at 0
-        def viewBar2(a, b):
-            pbar.total = int(b)
-            pbar.update(int(a - last[0]))  # update pbar with increment
-            last[0] = a  # update last known iteration
-        return viewBar2, pbar  # return callback, tqdmInstance
-
-# function to download a file and display progress bar using tqdm        
-def download_file(url, filename):
-   """
-   Helper method handling downloading large files from `url` to `filename`. Returns a pointer to `filename`.
-   """
-   chunkSize = 1024
-   r = requests.get(url, stream=True)
-   with open(filename, 'wb') as f:
-      pbar = tqdm( unit="B", total=int( r.headers['Content-Length'] ), unit_scale=True, unit_divisor=1024 )
-      for chunk in r.iter_content(chunk_size=chunkSize): 
-         if chunk: # filter out keep-alive new chunks
-            pbar.update (len(chunk))
-            f.write(chunk)
-   return filename
-
-def md5(fname):
-    hash_md5 = hashlib.md5()
-    with open(fname, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from downloader import download_file, get_file_size, promote_part, discard_part, TransferLimiter
+from arista_api import AristaSession, AristaApiError, load_folder_index
+from artefact_store import ArtefactStore, STORE_DIR, file_checksum
+from cvp_ssh import CvpSession
+
+
+def read_checksum(fname):
+    # checksum files are either just the checksum or the checksum followed by the filename
+    with open(fname, "r") as f:
+        return f.read().split()[0]
 
 def get_file_list(image, img):
    filename = []
@@ -205,10 +182,105 @@ def get_file_list(image, img):
          filename.append("EOS-" + image + ".swi") # filename should be something like EOS-4.22.1F.swi
    return filename, index
 
-def get_latest_version(root):
-   for child in root.iter('dir'):
-      if "EOS-" in child.attrib['label']: 
-         return (child.attrib['label'][4:])
+def get_folder_labels(image, img):
+   # returns the labels of the folders on arista.com the image can be in, and the extension of its checksum file
+   if "TerminAttr" in image: # special case for TerminAttr as some releases have -1 in the folder name others don't but the filename always has the -1
+      return [image, image + "-1"], '.md5sum'
+   elif img == "ipam":
+      return ["CVP IPAM Application"], '.sha512sum'
+   elif img == "remedy":
+      return ["Remedy-CVP"], '.sha512sum'
+   elif img == "cloudbuilder":
+      return ["Cloud Builder"], '.sha512sum'
+   elif "cvp" in image: # special case for CVP as labels are in the format 2020.1.1 so we need to remove 'cvp-' to match
+      return [image[4:]], '.md5'
+   else:
+      return ["EOS-" + image], '.sha512sum'
+
+def find_paths(folder_index, image, img, filename_list):
+   # returns the download paths of the image, its checksum and the 2nd file and its checksum for CVP IPAM and CloudBuilder
+   labels, chksum_ext = get_folder_labels(image, img)
+   files = folder_index.files(labels)
+   if img == 'RN': # the release notes filename has a suffix we don't know, so find the full filename
+      for release_notes in files:
+         if ('RN' in release_notes) and (filename_list[0] in release_notes):
+            filename_list[0] = release_notes
+            break
+   path = files.get(filename_list[0], "") # corresponds to the download path
+   sha512_path = files.get(filename_list[0] + chksum_ext) # corresponds to the download path of the checksum
+   path2 = None
+   sha512_path2 = None
+   if len(filename_list) > 1: # CVP IPAM and CloudBuilder have a 2nd file
+      path2 = files.get(filename_list[1])
+      sha512_path2 = files.get(filename_list[1] + chksum_ext)
+   return path, sha512_path, path2, sha512_path2
+
+def with_link(session, path, function, *args):
+   # calls function(link, *args) with the download link for the path, if the link doesn't work (e.g. it was saved by an
+   # earlier run or has expired while waiting behind other downloads) a new link is fetched and it's tried again once
+   try:
+      return function(session.download_link(path), *args)
+   except IOError:
+      if not session.forget_link(path):
+         raise
+      return function(session.download_link(path), *args)
+
+def fetch_file(session, path, filename, algorithm, expected, store, streams, overwrite, limiter):
+   # gets a file into the current folder, from the artefact store if it's already in there, otherwise by downloading it
+   # to a .part file which is only renamed once the checksum has been checked and then adding it to the store. The
+   # checksum is worked out as the file downloads
+   if os.path.isfile(filename) and not overwrite: # check if the image exists in the current directory, if so no need to download again
+      if expected is not None: # the local copy is only used if it has the right checksum, like a file from the store
+         if file_checksum(filename, algorithm) == expected:
+            print ("\nLocal copy of " + filename + " already exists, " + algorithm.upper() + " checksum correct")
+            return
+         print ("\nLocal copy of " + filename + " " + algorithm.upper() + " checksum incorrect, fetching it again")
+      elif os.path.getsize(filename) == with_link(session, path, get_file_size)[0]:
+         print ("\nLocal copy of " + filename + " already exists")
+         return
+      else:
+         print ("\nLocal copy of " + filename + " is incomplete, downloading it again")
+   if not overwrite:
+      if expected is not None:
+         cached = store.get(algorithm, expected)
+      else: # no checksum for the source files or release notes so go by the filename
+         cached = store.lookup(filename)
+      if cached is not None:
+         store.export(cached, filename)
+         print ("\n" + filename + " copied from the artefact store")
+         return
+   print(filename + " is currently downloading....")
+   checksum = with_link(session, path, download_file, filename, streams, False, algorithm, limiter)[1]
+   if expected is not None:
+      if checksum == expected:
+         print ("\n" + filename + " " + algorithm.upper() + " checksum correct")
+      else:
+         discard_part(filename)  # start from scratch next time rather than resuming a corrupt file
+         raise ValueError(filename + " " + algorithm.upper() + " checksum incorrect, downloaded file must be corrupt.")
+   # the download is complete so the .part file can be given its proper name
+   promote_part(filename)
+   store.add(filename, algorithm, checksum)
+
+def fetch_image(job, session, store, streams, overwrite, limiter):
+   # the checksum files are downloaded first so an image which is already in the artefact store isn't downloaded
+   # again, then the files for the image are fetched at the same time
+   expected = []
+   for filename, chksum_path in zip(job['files'], job['chksum_paths']):
+      if chksum_path is None:
+         expected.append(None)
+      else:
+         chksum_filename = with_link(session, chksum_path, download_file, filename + job['chksum_ext'], 1, True, 'sha512', limiter)[0]
+         expected.append(read_checksum(chksum_filename).lower())
+   with ThreadPoolExecutor(max_workers=len(job['files'])) as executor:
+      futures = [executor.submit(fetch_file, session, path, filename, job['algorithm'], checksum, store, streams, overwrite, limiter) for filename, path, checksum in zip(job['files'], job['paths'], expected)]
+      for future in futures:
+         future.result()
+   # return the checksums so the upload to CVP can be skipped if CVP already has the same file
+   return expected
+
+def upload_image(cvp_session, filename, checksum, upload_streams):
+   print ("\nUploading " + filename + " to CVP")
+   cvp_session.put(filename, '/root/' + filename, upload_streams, checksum)
 
 # function to validate the user inputs
 def check_arguments(api, file_list, img, cvp, rootpw, cvp_user, cvp_passwd, eve, overwrite, ztp):
@@ -264,6 +336,22 @@ parser.add_argument('--overwrite', required=False, action='store_true',
                     help="Use this option if you would like to overwrite any previously downloaded files")
 parser.add_argument('--disable_ztp', required=False, action='store_true',
                     help='Disable ZTP mode for vEOS-lab images running in Eve-NG')
+parser.add_argument('--streams', required=False, type=int,
+                    default=4, help='Number of parallel connections to download each large file with')
+parser.add_argument('--parallel', required=False, type=int,
+                    default=2, help='Number of images to download at the same time when --ver is used more than once')
+parser.add_argument('--max_connections', required=False, type=int,
+                    default=8, help='Maximum number of connections open at once across all the downloads, 0 for no limit')
+parser.add_argument('--max_rate', required=False, type=float,
+                    default=0, help='Maximum total download rate in MB/s across all the downloads, 0 for no limit')
+parser.add_argument('--upload_streams', required=False, type=int,
+                    default=4, help='Number of parallel SFTP channels to upload each large file to CVP with')
+parser.add_argument('--store', required=False,
+                    default=STORE_DIR, help='Directory of the artefact store shared with bugalertUpdate.py')
+parser.add_argument('--store_size', required=False, type=float,
+                    default=20, help='Size cap for the artefact store in GB, the least recently used files are removed above this')
+parser.add_argument('--refresh_index', '--refresh-index', required=False, action='store_true',
+                    help='Fetch the arista.com folder tree again rather than using the saved index')
 
 args = parser.parse_args()
 
@@ -277,239 +365,157 @@ cvp_passwd = args.cvp_passwd
 eve = args.eve
 overwrite = args.overwrite
 ztp = args.disable_ztp
+streams = args.streams
+upload_streams = args.upload_streams
+refresh_index = args.refresh_index
+store_dir = args.store
+store_size = args.store_size
+parallel = args.parallel
+max_connections = args.max_connections
+max_rate = args.max_rate
 
 if not check_arguments(api, file_list, img, cvp, rootpw, cvp_user, cvp_passwd, eve, overwrite, ztp):
    sys.exit()
 
-# the api key needs converting into base64 which outputs a byte value and then decoding to a string
-creds = (base64.b64encode(api.encode())).decode("utf-8")
+# there are 3 steps to downloading an image via the API, first is to get a session code. The session code is saved
+# and reused by later runs until it expires, so it's only fetched when it's first needed
+session = AristaSession(api)
 
-# there are 3 steps to downloading an image via the API, first is to get a session code
-session_code_url = "https://www.arista.com/custom_data/api/cvp/getSessionCode/"
-jsonpost = {'accessToken': creds}
-result = requests.post(session_code_url, data=json.dumps(jsonpost))
-if result.json()["status"]["message"] == 'Access token expired':
-   print("The API token has expired. Please visit arista.com, click on your profile and select Regenerate Token then re-run the script with the new token.")
+# then get the current folder tree, similar to what you see on the download page, indexed by folder and saved so
+# later runs don't need to fetch it again
+try:
+   folder_index = load_folder_index(session, refresh=refresh_index)
+except AristaApiError as ERR:
+   print(str(ERR))
    sys.exit()
-elif result.json()["status"]["message"] == 'Invalid access token':
-   print("The API token is incorrect. Please visit arista.com, click on your profile and check the Access Token. Then re-run the script with the correct token.")
-   sys.exit()
-session_code = (result.json()["data"]["session_code"])
-
-# then get the current folder tree, similar to what you see on the download page in XML format
-folder_tree_url = "https://www.arista.com/custom_data/api/cvp/getFolderTree/"
-jsonpost = {'sessionCode': session_code}
-result = requests.post(folder_tree_url, data=json.dumps(jsonpost))
 
-folder_tree = (result.json()["data"]["xml"])
-root = ET.fromstring(folder_tree)
-
-path = ""
 if file_list[0] == "latest":
-   file_list[0] = get_latest_version(root)
+   file_list[0] = folder_index.latest_eos()
 
+# if the images are going to be uploaded to CVP, check everything needed for that is there before downloading anything
+if cvp != '':
+   if (rootpw == '') or (cvp_user == '') or (cvp_passwd == ''):
+      print ("\nTo upload images to CVP, the root password, GUI username and password all need to be specified. Please re-run the script with the --rootpw, --cvp_user and --cvp_passwd options")
+      sys.exit()
 
-# for each image the user wishes to download
+# work out the files to download for each image the user wishes to download
+jobs = []
 for image in file_list:
-   image_type = get_file_list(image, img)[1]
    filename_list = get_file_list(image, img)[0]
 
-   if os.path.isfile(filename_list[0]) and not overwrite: # check if the image exists in the current directory, if so no need to download again
-      print ("\nLocal copy of file already exists")
-   else:
-      for child in root.iter('dir'):
-         #print(child.attrib)
-         if child.attrib == {'label': "EOS-" + image}:
-            for grandchild in child.iter('file'):
-               #print(grandchild.text)
-               if grandchild.text == (filename_list[0]):
-                  path = grandchild.attrib['path'] # corresponds to the download path
-               elif grandchild.text == (filename_list[0] + '.sha512sum'):
-                  sha512_path = grandchild.attrib['path'] # corresponds to the download path of the sha512 checksum
-               elif ('RN' in grandchild.text) and (filename_list[0] in grandchild.text):
-                  filename_list[0] = grandchild.text
-                  path = grandchild.attrib['path'] # corresponds to the download path
-         elif child.attrib == {'label': image} or child.attrib == {'label': image + "-1"}  : # special case for TerminAttr as some releases have -1 in the folder name others don't but the filename always has the -1
-            #print (child.attrib)
-            for grandchild in child.iter('file'):
-               if grandchild.text == (filename_list[0]):
-                  path = grandchild.attrib['path']
-               elif grandchild.text == (filename_list[0] + '.md5sum'):
-                  sha512_path = grandchild.attrib['path'] # corresponds to the download path of the MD5 checksum
-         elif child.attrib == {'label': image[4:]} : # special case for CVP as labels are in the format 2020.1.1 so we need to remove 'cvp-' to match
-            #print (child.attrib)
-            for grandchild in child.iter('file'):
-               if grandchild.text == (filename_list[0]):
-                  path = grandchild.attrib['path']
-               elif grandchild.text == (filename_list[0] + '.md5'):
-                  sha512_path = grandchild.attrib['path'] # corresponds to the download path of the MD5 checksum
-         elif child.attrib == {'label': "CVP IPAM Application"} and img == "ipam":
-            for grandchild in child.iter('file'):
-               #print(grandchild.text)
-               if grandchild.text == (filename_list[0]):
-                  path = grandchild.attrib['path']
-               elif grandchild.text == (filename_list[1]):
-                  path2 = grandchild.attrib['path']
-               elif grandchild.text == (filename_list[0] + '.sha512sum'):
-                  sha512_path = grandchild.attrib['path'] # corresponds to the download path of the SHA512 checksum
-               elif grandchild.text == (filename_list[1] + '.sha512sum'):
-                  sha512_path2 = grandchild.attrib['path'] # corresponds to the download path of the SHA512 checksum
-         elif child.attrib == {'label': "Remedy-CVP"} and img == "remedy":
-            for grandchild in child.iter('file'):
-               #print(grandchild.text)
-               if grandchild.text == (filename_list[0]):
-                  path = grandchild.attrib['path']
-               elif grandchild.text == (filename_list[0] + '.sha512sum'):
-                  sha512_path = grandchild.attrib['path'] # corresponds to the download path of the SHA512 checksum
-         elif child.attrib == {'label': "Cloud Builder"} and img == "cloudbuilder":
-            for grandchild in child.iter('file'):
-               #print(grandchild.text)
-               if grandchild.text == (filename_list[0]):
-                  path = grandchild.attrib['path']
-               elif grandchild.text == (filename_list[1]):
-                  path2 = grandchild.attrib['path']
-               elif grandchild.text == (filename_list[0] + '.sha512sum'):
-                  sha512_path = grandchild.attrib['path'] # corresponds to the download path of the SHA512 checksum
-               elif grandchild.text == (filename_list[1] + '.sha512sum'):
-                  sha512_path2 = grandchild.attrib['path'] # corresponds to the download path of the SHA512 checksum
-
-      if path == "": # this means we haven't found the image so we exit the script at this point
-         print("\nFile " + eos_filename +" does not exist.")
+   # look up the download paths of the image and its checksum in the saved index
+   path, sha512_path, path2, sha512_path2 = find_paths(folder_index, image, img, filename_list)
+   if path == "" and folder_index.from_cache: # the image may have been released since the index was saved
+      try:
+         folder_index = load_folder_index(session, refresh=True)
+      except AristaApiError as ERR:
+         print(str(ERR))
          sys.exit()
-      if os.path.isfile(filename_list[0]) and not overwrite: # check if the image exists in the current directory, if so no need to download again
-         print ("\nLocal copy of file already exists")
-
-      # the 3rd part of downloading a file is to use the path and session code to get the actual direct download link URL
-      download_link_url = "https://www.arista.com/custom_data/api/cvp/getDownloadLink/"
-      jsonpost = {'sessionCode': session_code, 'filePath': path}
-      result = requests.post(download_link_url, data=json.dumps(jsonpost))
-      download_link = (result.json()["data"]["url"])         
-
-
-      print(filename_list[0] + " is currently downloading....")
-      # download the file to the current folder
-      download_file (download_link, filename_list[0])
-      if img == "ipam":  # for CVP IPAM there's 2 files to download so this grabs the 2nd file
-         jsonpost = {'sessionCode': session_code, 'filePath': path2}
-         result = requests.post(download_link_url, data=json.dumps(jsonpost))
-         download_link = (result.json()["data"]["url"])
-         print(filename_list[1] + " is currently downloading....")  
-         download_file(download_link, filename_list[1])
-      elif img == "cloudbuilder":  # for CVP CloudBuilder there's 2 files to download so this grabs the 2nd file
-         jsonpost = {'sessionCode': session_code, 'filePath': path2}
-         result = requests.post(download_link_url, data=json.dumps(jsonpost))
-         download_link = (result.json()["data"]["url"])
-         print(filename_list[1] + " is currently downloading....")  
-         download_file(download_link, filename_list[1])
-
-
-      if (img != 'source') and (img != 'RN'):
-         jsonpost = {'sessionCode': session_code, 'filePath': sha512_path}
-         sha512_result = requests.post(download_link_url, data=json.dumps(jsonpost))
-         sha512_download_link = (sha512_result.json()["data"]["url"])
-         if "TerminAttr" in image:
-            download_file (sha512_download_link, filename_list[0] + '.md5sum')
-         if "cvp" in image:
-            download_file (sha512_download_link, filename_list[0] + '.md5')
-         else:
-            download_file (sha512_download_link, filename_list[0] + '.sha512sum')
-         for line in urllib.request.urlopen(sha512_download_link):
-            sha512_file = line
-
-         if img == "ipam":
-            jsonpost = {'sessionCode': session_code, 'filePath': sha512_path2}
-            sha512_result = requests.post(download_link_url, data=json.dumps(jsonpost))
-            sha512_download_link = (sha512_result.json()["data"]["url"])
-            download_file (sha512_download_link, filename_list[1] + '.sha512sum')
-            for line in urllib.request.urlopen(sha512_download_link):
-               sha512_file2 = line
-      
-         if img == "cloudbuilder":
-            jsonpost = {'sessionCode': session_code, 'filePath': sha512_path2}
-            sha512_result = requests.post(download_link_url, data=json.dumps(jsonpost))
-            sha512_download_link = (sha512_result.json()["data"]["url"])
-            download_file (sha512_download_link, filename_list[1] + '.sha512sum')
-            for line in urllib.request.urlopen(sha512_download_link):
-               sha512_file2 = line
-
-         if "TerminAttr" in image:
-            download_file_chksum = md5(filename_list[0])  # calculate the MD5 checksum of the downloaded file, note only MD5 checksum available for TerminAttr images
-            if (download_file_chksum == (sha512_file.decode("utf-8").split(" ")[0])):
-               print ("\nMD5 checksum correct")
-            else:
-               print ("\nMD5 checksum incorrect, downloaded file must be corrupt.")
-               sys.exit()
-         elif "cvp" in image:
-            download_file_chksum = md5(filename_list[0])  # calculate the MD5 checksum of the downloaded file, note only MD5 checksum available for CVP images
-            if (download_file_chksum == sha512_file.decode("utf-8").rstrip('\n')):
-               print ("\nMD5 checksum correct")
-            else:
-               print ("\nMD5 checksum incorrect, downloaded file must be corrupt.")
-               sys.exit()
-         else:
-            download_file_chksum = os.popen("openssl sha512 " + filename_list[0]).read()  # calculate the SHA512 checksum of the downloaded file
-            if (download_file_chksum.split(" ")[1].rstrip('\n')) == (sha512_file.decode("utf-8").split(" ")[0]):
-               print ("\nSHA512 checksum correct")
-            else:
-               print ("\nSHA512 checksum incorrect, downloaded file must be corrupt.")
-               sys.exit()
+      path, sha512_path, path2, sha512_path2 = find_paths(folder_index, image, img, filename_list)
 
-if cvp != '': # if the CVP IP address has been specified when running the script, the user must want to upload the image to CVP
-   if (rootpw == '') or (cvp_user == '') or (cvp_passwd == ''):
-      print ("\nTo upload images to CVP, the root password, GUI username and password all need to be specified. Please re-run the script with the --rootpw, --cvp_user and --cvp_passwd options")
+   if path == "": # this means we haven't found the image so we exit the script at this point
+      print("\nFile " + filename_list[0] +" does not exist.")
       sys.exit()
-   terminattr_filename = ""
-   t = paramiko.Transport((cvp, 22))
-   t.connect(username="root", password=rootpw)
-   sftp = paramiko.SFTPClient.from_transport(t)
-   for image in file_list:
-      if "-INT" in image:
-         filename = "EOS-" + image + ".swi"
-         image = image.rstrip("-INT")
-         eos_filename = filename
-         eos_bundle = image
-      elif "TerminAttr" in image:
-         filename = image + "-1.swix"
-         terminattr_filename = filename
-      elif img == 'vEOS-lab-swi':
-         filename = "vEOS-lab-" + image + ".swi"
-         eos_filename = filename
-         eos_bundle = image
-      else:
-         filename = "EOS-" + image + ".swi"
-         eos_filename = filename
-         eos_bundle = image
-
-      print ("\nUploading " + filename + " to CVP")
-      cbk, pbar = tqdmWrapViewBar(ascii=True, unit="B", unit_scale=True)
-      sftp.put(filename, '/root/' + filename, callback=cbk)
-      pbar.close()
 
-   ssh = SSHClient()
-   ssh.load_system_host_keys()
-   ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-   ssh.connect(cvp, username="root", password=rootpw)
+   # only an MD5 checksum is available for TerminAttr and CVP images, everything else has a SHA512 checksum
+   if "TerminAttr" in image or "cvp" in image:
+      algorithm = 'md5'
+   else:
+      algorithm = 'sha512'
+   if (img == 'source') or (img == 'RN'): # there are no checksums for the source files or release notes
+      sha512_path = None
+      sha512_path2 = None
+
+   job = {'image': image, 'files': filename_list[:1], 'paths': [path], 'chksum_paths': [sha512_path],
+          'chksum_ext': get_folder_labels(image, img)[1], 'algorithm': algorithm}
+   if img == "ipam" or img == "cloudbuilder":  # for CVP IPAM and CloudBuilder there's 2 files to download
+      job['files'].append(filename_list[1])
+      job['paths'].append(path2)
+      job['chksum_paths'].append(sha512_path2)
+   jobs.append(job)
+
+# the 3rd part of downloading a file is to use the path and session code to get the actual direct download link URL,
+# the links for all the files and checksums are fetched up front, any links saved by an earlier run are reused
+try:
+   session.download_links([x for job in jobs for x in job['paths'] + job['chksum_paths'] if x])
+except AristaApiError as ERR:
+   print(str(ERR))
+   sys.exit()
 
-   print ("\nFile copied to CVP server\nNow importing " + filename_list[0] + " into HDBase.")
+if cvp != '':
+   terminattr_filename = ""
+   # one SSH connection to CVP is used for the uploads and for importing the images afterwards
+   cvp_session = CvpSession(cvp, "root", rootpw)
+
+# download the images at the same time, sharing out the connections and bandwidth, and as each one is checked start
+# uploading it to CVP while the others carry on downloading, the uploads (e.g. the SWI and the TerminAttr SWIX) also
+# run at the same time over the one SSH connection
+failed = False
+limiter = TransferLimiter(max_connections, max_rate * 1000000)
+store = ArtefactStore(store_dir, store_size * 1024 * 1024 * 1024)
+with ThreadPoolExecutor(max_workers=max(parallel, 1)) as download_pool, ThreadPoolExecutor(max_workers=max(len(jobs), 1)) as upload_pool:
+   futures = {}
+   for job in jobs:
+      futures[download_pool.submit(fetch_image, job, session, store, streams, overwrite, limiter)] = job
+   uploads = []
+   for future in as_completed(futures):
+      job = futures[future]
+      try:
+         expected = future.result()
+      except Exception as ERR:
+         print ("\n" + str(ERR))
+         failed = True
+         continue
+      if cvp != '': # if the CVP IP address has been specified when running the script, the user must want to upload the image to CVP
+         image = job['image']
+         if "-INT" in image:
+            filename = "EOS-" + image + ".swi"
+            image = image.rstrip("-INT")
+            eos_filename = filename
+            eos_bundle = image
+         elif "TerminAttr" in image:
+            filename = image + "-1.swix"
+            terminattr_filename = filename
+         elif img == 'vEOS-lab-swi':
+            filename = "vEOS-lab-" + image + ".swi"
+            eos_filename = filename
+            eos_bundle = image
+         else:
+            filename = "EOS-" + image + ".swi"
+            eos_filename = filename
+            eos_bundle = image
+         checksum = (job['algorithm'], expected[0]) if expected[0] else None
+         uploads.append(upload_pool.submit(upload_image, cvp_session, filename, checksum, upload_streams))
+   for upload in uploads:
+      try:
+         upload.result()
+      except Exception as ERR:
+         print ("\n" + str(ERR))
+         failed = True
+session.save() # in case any saved download links had to be replaced
+if failed:
+   if cvp != '':
+      cvp_session.close()
+   sys.exit()
 
+if cvp != '': # if the CVP IP address has been specified when running the script, the user must want to upload the image to CVP
+   print ("\nFile copied to CVP server\nNow importing " + jobs[-1]['files'][0] + " into HDBase.")
 
    if (eos_filename != '') and (terminattr_filename != ''):
-      stdin, stdout, stderr = ssh.exec_command('python /cvpi/tools/imageUpload.py --swi ' + eos_filename + ' --swix' + terminattr_filename + ' --bundle EOS-' + eos_bundle + ' --user ' + cvp_user + ' --password ' + cvp_passwd)
+      exit_status, stdout, stderr = cvp_session.run('python /cvpi/tools/imageUpload.py --swi ' + eos_filename + ' --swix ' + terminattr_filename + ' --bundle EOS-' + eos_bundle + ' --user ' + cvp_user + ' --password ' + cvp_passwd, check=False)
    else:
-      stdin, stdout, stderr = ssh.exec_command('python /cvpi/tools/imageUpload.py --swi ' + eos_filename + ' --bundle EOS-' + eos_bundle + ' --user ' + cvp_user + ' --password ' + cvp_passwd)
-   exit_status = stdout.channel.recv_exit_status()
+      exit_status, stdout, stderr = cvp_session.run('python /cvpi/tools/imageUpload.py --swi ' + eos_filename + ' --bundle EOS-' + eos_bundle + ' --user ' + cvp_user + ' --password ' + cvp_passwd, check=False)
    if exit_status == 0:
       print ("\nUpload complete")
    else:
       print ("\nFile not uploaded because ")
-      if (stdout.read()).decode("utf-8") == "Connecting to CVP\nImage " + eos_filename + " already exists. Aborting.\n":
+      if stdout == "Connecting to CVP\nImage " + eos_filename + " already exists. Aborting.\n":
          print ("Image already exists in CVP")
-      elif "SWI does not contain a supported TerminAttr version" in (stderr.read()).decode("UTF-8"):
+      elif "SWI does not contain a supported TerminAttr version" in stderr:
          print ("SWI does not contain a supported TerminAttr version.")
       else:
-         print ("Some other error - " + (stderr.read()).decode("UTF-8") + ". Exit status was " + str(exit_status))
-   if ssh:
-      ssh.close()
+         print ("Some other error - " + stderr.strip() + ". Exit status was " + str(exit_status))
+   cvp_session.close()
 
 
 if eve:
@@ -1,11 +1,15 @@
 #!/usr/bin/python3
 
-import pyeapi
 import re
 import ssl
 import sys
+import os
+import json
+import time
+import argparse
 import ipaddress
 import pprint
+from eapi_fleet import load_hosts, ConnectionPool, run_on_switches
 
 try:
   _create_unverified_https_context = ssl._create_unverified_context
@@ -16,67 +20,207 @@ else:
 # Handle target environment that doesn't support HTTPS verification
   ssl._create_default_https_context = _create_unverified_https_context
 
-network_range = ipaddress.ip_network(sys.argv[1])
-# ip_list = open("IP-Address-List.txt", "r")
-hosts = []
-
-# Find the home directory where the .eap.conf file is located
-from os.path import expanduser
-home = expanduser("~")
-
-# read in the contents of the eapi.conf file and build a list of all the hostnames in a list called 'hosts'
-with open(home + "/.eapi.conf", "r") as file_object:
-    line = file_object.readline()
-    while line:
-       if "connection" in line:
-          hostname = line.lstrip('[connection:')
-          hostname = hostname.rstrip(']\n\r')
-          hosts.append(hostname)
-          line = file_object.readline()
-       else:
-          line = file_object.readline()
-
-# create empty dictionary called 'topology'
-topology = {}
-z = 1
-# go through the hosts list, run the 'show lldp neighbors' command and populate the topology dictionary with the info
-for x in hosts:
-    switch = pyeapi.connect_to(x)
+# run 'show lldp neighbors' on a single switch and return a list of its links
+def get_lldp_links(switch):
     lldp = switch.enable("show lldp neighbors")
     links = []
     for i in lldp[0]["result"]["lldpNeighbors"]:
         links.append({'local_int': i["port"] , 'neighbor_sw': (i["neighborDevice"].rsplit(".")[0]) , 'neighbor_int': i["neighborPort"] , 'ip_address': ""})
-    topology[x] =links
-
-n = 0
-
-# from the given IP subnet, build a list of available /30 subnets
-available_subnets = list(ipaddress.ip_network(network_range).subnets(prefixlen_diff=(30-network_range.prefixlen)))
-
-# go through each host in the topology dictionary
-for host in topology:
-    switch = pyeapi.connect_to(host)
-    r = 0
-# for each interface for the host which has LLDP neighbors
-    for interface in topology[host]:
-# if the interface IP addresss hasn't been populated yet
-        if interface["ip_address"] == '':
-            switch = pyeapi.connect_to(host)
-# configure the interface on the current host with the next available IP 
-            switch.config(['interface ' + interface["local_int"], 'no switchport', 'ip pim sparse-mode', 'ip address ' + str(list(available_subnets[n].hosts())[0]) + '/30'])
-            topology[host][r]["ip_address"] = str(list(available_subnets[n].hosts())[0])
-            s = 0
-            for neighbor_int in topology[(topology[host][r]["neighbor_sw"])]:
-                if neighbor_int["local_int"] == topology[host][r]["neighbor_int"]:
-                    switch = pyeapi.connect_to((topology[host][r]["neighbor_sw"]))
-                    switch.config(['interface ' + neighbor_int["local_int"], 'no switchport', 'ip address ' + str(list(available_subnets[n].hosts())[1]) + '/30'])
-                    topology[(topology[host][r]["neighbor_sw"])][s]["ip_address"] = str(list(available_subnets[n].hosts())[1])
-                    break
-                s += 1
-            n += 1
-            r +=1
-        else:
-            r += 1
+    return links
 
+# run LLDP discovery on all the hosts using a pool of worker threads and return the topology
+# dictionary, keyed on hostname in the same order as the hosts list
+def discover_topology(pool, hosts, workers):
+    discovered, failed = run_on_switches(lambda x: get_lldp_links(pool.get(x)), hosts, workers)
+    if failed:
+        # don't address a partial topology, the links to the missing switches would be left out
+        for x in sorted(failed):
+            print("LLDP discovery failed on " + x + " - " + failed[x])
+        sys.exit(1)
+    return {x: discovered[x] for x in hosts}
 
+# return the topology from the snapshot file if it's recent enough and covers the same hosts,
+# otherwise return None so discovery is run again
+def load_topology_snapshot(filename, max_age, hosts):
+    if not os.path.isfile(filename):
+        return None
+    if time.time() - os.path.getmtime(filename) > max_age:
+        return None
+    try:
+        with open(filename, 'r') as file_object:
+            snapshot = json.load(file_object)
+    except ValueError:
+        # e.g. a snapshot left half written by an older version of this script
+        return None
+    if set(snapshot) != set(hosts):
+        return None
+    return {x: snapshot[x] for x in hosts}
 
+# the snapshot is written to a temporary file which is renamed into place, so an interrupted run
+# never leaves a half written snapshot behind
+def save_topology_snapshot(filename, topology):
+    with open(filename + ".tmp", 'w') as file_object:
+        json.dump(topology, file_object, indent=2)
+    os.replace(filename + ".tmp", filename)
+
+# build an index of every link in the topology keyed on (switch, interface) so the other end of
+# a link can be found directly rather than searching through the neighbor's list of links
+def build_link_index(topology):
+    link_index = {}
+    for host in topology:
+        for link in topology[host]:
+            link_index[(host, link["local_int"])] = link
+    return link_index
+
+# generator which hands out the two host addresses of each /30 in the network range in turn, the
+# addresses are worked out from the network address so the list of subnets is never built
+def p2p_subnets(network_range):
+    network_address = network_range.network_address
+    for offset in range(0, network_range.num_addresses - 3, 4):
+        yield str(network_address + offset + 1), str(network_address + offset + 2)
+
+# work out the address for every interface with an LLDP neighbor, filling in the ip_address of each
+# link in the topology and returning the plan as a list of the interfaces to configure in order
+def assign_addresses(topology, network_range):
+    link_index = build_link_index(topology)
+    subnets = p2p_subnets(network_range)
+    plan = []
+    # go through each host in the topology dictionary
+    for host in topology:
+        # for each interface for the host which has LLDP neighbors
+        for interface in topology[host]:
+            # if the interface IP addresss hasn't been populated yet
+            if interface["ip_address"] != '':
+                continue
+            try:
+                local_ip, neighbor_ip = next(subnets)
+            except StopIteration:
+                print("Not enough /30 subnets in " + str(network_range) + " to address all the links")
+                sys.exit(1)
+            # configure the interface on the current host with the next available IP
+            interface["ip_address"] = local_ip
+            plan.append({'host': host, 'interface': interface["local_int"], 'ip_address': local_ip,
+                         'config': ['interface ' + interface["local_int"], 'no switchport', 'ip pim sparse-mode', 'ip address ' + local_ip + '/30']})
+            neighbor_int = link_index.get((interface["neighbor_sw"], interface["neighbor_int"]))
+            if neighbor_int is not None:
+                neighbor_int["ip_address"] = neighbor_ip
+                plan.append({'host': interface["neighbor_sw"], 'interface': neighbor_int["local_int"], 'ip_address': neighbor_ip,
+                             'config': ['interface ' + neighbor_int["local_int"], 'no switchport', 'ip address ' + neighbor_ip + '/30']})
+    return plan
+
+# group the plan into a single list of config commands for each switch so every switch is
+# configured with one eAPI call no matter how many of its interfaces are being addressed
+def build_switch_configs(plan):
+    switch_configs = {}
+    for entry in plan:
+        if entry['host'] not in switch_configs:
+            switch_configs[entry['host']] = []
+        switch_configs[entry['host']].extend(entry['config'])
+    return switch_configs
+
+# push the config to each switch using a pool of worker threads and return a dictionary of the
+# switches which failed along with the error
+def push_switch_configs(pool, switch_configs, workers):
+    results, failed = run_on_switches(lambda x: pool.get(x).config(switch_configs[x]), switch_configs, workers)
+    return failed
+
+# run 'show ip interface brief' on a single switch and return the address of each interface in
+# the same address/mask form as the plan
+def get_interface_addresses(switch):
+    command = switch.enable("show ip interface brief")
+    addresses = {}
+    for key in command[0]['result']['interfaces'].keys():
+        ip_addr = command[0]['result']['interfaces'][key]['interfaceAddress']['ipAddr']
+        addresses[key] = ip_addr['address'] + '/' + str(ip_addr['maskLen'])
+    return addresses
+
+# collect the current interface addresses from every switch in the plan and return only the
+# entries where the interface doesn't already have the planned address
+def remove_configured_interfaces(pool, plan, workers):
+    plan_hosts = []
+    for entry in plan:
+        if entry['host'] not in plan_hosts:
+            plan_hosts.append(entry['host'])
+    current, failed = run_on_switches(lambda x: get_interface_addresses(pool.get(x)), plan_hosts, workers)
+    if failed:
+        for x in sorted(failed):
+            print("Failed to get the interface addresses from " + x + " - " + failed[x])
+        sys.exit(1)
+    changes = []
+    for entry in plan:
+        if current[entry['host']].get(entry['interface']) != entry['ip_address'] + '/30':
+            changes.append(entry)
+    return changes
+
+def save_plan(filename, plan):
+    with open(filename, 'w') as file_object:
+        json.dump(plan, file_object, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('subnet',
+                        help='IP subnet to take the /30 point to point subnets from, e.g. 192.168.1.0/24')
+    parser.add_argument('--workers', required=False, type=int,
+                        default=10, help='Number of switches to run LLDP discovery on and configure in parallel')
+    parser.add_argument('--use_cache', required=False, action='store_true',
+                        help='Reuse the topology snapshot in the cache file if it is recent instead of running LLDP discovery again')
+    parser.add_argument('--cache_file', required=False,
+                        default='topology.json', help='File the discovered topology snapshot is saved to and read from')
+    parser.add_argument('--cache_age', required=False, type=int,
+                        default=3600, help='Maximum age in seconds of a topology snapshot for it to be reused with --use_cache')
+
+    parser.add_argument('--diff', required=False, action='store_true',
+                        help='Only configure the interfaces which do not already have the planned address, the current addresses are read with "show ip interface brief"')
+    parser.add_argument('--plan_file', required=False,
+                        default='', help='File to write the address plan to in JSON format')
+    parser.add_argument('--dry_run', required=False, action='store_true',
+                        help='Work out the address plan but do not configure any switches, use with --plan_file to save the plan')
+
+    args = parser.parse_args()
+
+    network_range = ipaddress.ip_network(args.subnet)
+    workers = args.workers
+    use_cache = args.use_cache
+    cache_file = args.cache_file
+    cache_age = args.cache_age
+    diff = args.diff
+    plan_file = args.plan_file
+    dry_run = args.dry_run
+
+    # build a list of all the hostnames in the eapi.conf file in a list called 'hosts', one
+    # connection is kept open to each switch for discovery and configuring it
+    hosts = load_hosts()
+    pool = ConnectionPool()
+
+    # go through the hosts list, run the 'show lldp neighbors' command and populate the topology dictionary with the info
+    topology = None
+    if use_cache:
+        topology = load_topology_snapshot(cache_file, cache_age, hosts)
+        if topology is not None:
+            print("Using topology snapshot from " + cache_file)
+    if topology is None:
+        topology = discover_topology(pool, hosts, workers)
+        save_topology_snapshot(cache_file, topology)
+
+    # work out the addresses for all the links first and then configure each switch in one go
+    plan = assign_addresses(topology, network_range)
+    if diff:
+        total = len(plan)
+        plan = remove_configured_interfaces(pool, plan, workers)
+        print(str(total - len(plan)) + " of " + str(total) + " interfaces already have the planned address")
+    if plan_file:
+        save_plan(plan_file, plan)
+        print("Address plan written to " + plan_file)
+    if dry_run:
+        sys.exit()
+
+    switch_configs = build_switch_configs(plan)
+    failed = push_switch_configs(pool, switch_configs, workers)
+    pool.close()
+
+    print("Configured " + str(len(plan)) + " interfaces on " + str(len(switch_configs) - len(failed)) + " of " + str(len(switch_configs)) + " switches")
+    if failed:
+        print("The following switches failed:")
+        for x in sorted(failed):
+            print("  " + x + " - " + failed[x])
+        sys.exit(1)
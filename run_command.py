@@ -1,9 +1,11 @@
 #!/usr/bin/python3
 
-import pyeapi
 import argparse
 import ssl
 import ipaddress
+import sys
+import time
+from eapi_fleet import load_hosts, ConnectionPool, run_on_switches
 
 try:
   _create_unverified_https_context = ssl._create_unverified_context
@@ -25,6 +27,16 @@ parser.add_argument('--config_file', required=False,
                     default='', help='File with config in to apply')  
 parser.add_argument('--remove', required=False, action='store_true',
                     default='', help='If used will remove the config in the specified file by adding "no" to each line of config')                                        
+parser.add_argument('--role', required=False,
+                    default='', help='Only apply the config to switches with this role in eapi.conf, e.g. leaf or spine')
+parser.add_argument('--site', required=False,
+                    default='', help='Only apply the config to switches with this site in eapi.conf')
+parser.add_argument('--tag', required=False, action='append',
+                    default=[], help='Only apply the config to switches with this tag in eapi.conf, repeat --tag to require several tags')
+parser.add_argument('--workers', required=False, type=int,
+                    default=10, help='Number of switches to configure in parallel, use 1 to configure one switch at a time')
+parser.add_argument('--timeout', required=False, type=int,
+                    default=60, help='Timeout in seconds for the eAPI connection to each switch')
 
 args = parser.parse_args()
 
@@ -33,30 +45,23 @@ interface = args.interface
 addr = args.addr
 config_file = args.config_file
 remove = args.remove
+role = args.role
+site = args.site
+tags = args.tag
+workers = args.workers
+timeout = args.timeout
 
 if addr:
     network_range = ipaddress.ip_network(addr)
     # from the given IP subnet, build a list of available /32 subnets
     available_addr = list(ipaddress.ip_network(network_range).subnets(prefixlen_diff=(32-network_range.prefixlen)))
 
-# Find the home directory where the .eap.conf file is located
-from os.path import expanduser
-home = expanduser("~")
-hosts = []
 n = 1
 config_list = []
 
-# read in the contents of the eapi.conf file and build a list of all the hostnames in a list called 'hosts'
-with open(home + "/.eapi.conf", "r") as file_object:
-    line = file_object.readline()
-    while line:
-       if "connection" in line:
-          hostname = line.lstrip('[connection:')
-          hostname = hostname.rstrip(']\n\r')
-          hosts.append(hostname)
-          line = file_object.readline()
-       else:
-          line = file_object.readline()
+# build a list of all the hostnames in the eapi.conf file in a list called 'hosts', only
+# including the switches which match any --role, --site and --tag options
+hosts = load_hosts(role=role, site=site, tags=tags)
 
 if config_file:
     with open(config_file, 'r') as config_file_object:
@@ -69,17 +74,37 @@ if config_file:
                config_list.append(line)
                line = config_file_object.readline()
 
-for x in hosts:    
-    switch = pyeapi.connect_to(x)
+# the eAPI timeout is overridden so a single unresponsive switch can't hold up a worker for
+# longer than the --timeout value
+pool = ConnectionPool(timeout=timeout)
+
+# apply the config to a single switch, this is run in a worker thread for each host
+def configure_host(x):
+    switch = pool.get(x)
+    return switch.config(host_commands[x])
+
+# build the list of commands for each switch up front, for the --interface option each
+# switch gets the next address from the range in the order they appear in eapi.conf
+host_commands = {}
+for x in hosts:
     if conf:
-        command = switch.config(conf)
-    elif interface:     
-        command = switch.config(["interface " + interface, "ip address " + str(available_addr[n])])
+        host_commands[x] = conf
+    elif interface:
+        host_commands[x] = ["interface " + interface, "ip address " + str(available_addr[n])]
         n += 1
     elif config_file:
-        command = switch.config(config_list)
-
-
+        host_commands[x] = config_list
 
+start_time = time.time()
 
+# push the config to the switches using a pool of worker threads, at most 'workers' switches
+# are being configured at any one time
+results, failed = run_on_switches(configure_host, host_commands, workers)
+pool.close()
 
+print("\nConfigured " + str(len(results)) + " of " + str(len(host_commands)) + " switches in %.2f seconds" % (time.time() - start_time))
+if failed:
+    print("The following switches failed:")
+    for x in sorted(failed):
+        print("  " + x + " - " + failed[x])
+    sys.exit(1)
@@ -0,0 +1,133 @@
+"""
+DESCRIPTION
+Structured run logs for scheduled scripts such as bugalertUpdate.py. Each run builds up a record
+of how long each phase took, how many bytes were moved and how it ended, and appends it as one
+line of JSON to a log file, so the runs can be read back and summarised with run_log_summary.py
+to see where the time goes.
+
+A run can have targets (e.g. each CVP cluster updated) which are worked on at the same time, each
+with its own phases, bytes and outcome recorded under the run.
+
+This file needs to be kept in the same directory as the scripts which use it.
+
+Example usage:
+
+from run_log import RunLog
+
+run = RunLog('bugalertUpdate')
+with run.phase('download'):
+    ...
+run.add_bytes('download', 1024)
+cluster = run.target('10.0.0.1')
+with cluster.phase('upload'):
+    ...
+cluster.set(outcome='updated')
+run.set(outcome='updated')
+run.write('bugalertUpdate.jsonl')
+"""
+__author__ = 'marayson'
+
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PhaseTimer(object):
+    """
+    The phase timings, byte counts and other fields for a run or one of its targets. Phases
+    with the same name add up, and phases can be timed from more than one thread at once
+    """
+    def __init__(self, record, lock):
+        self.record = record
+        self.record.setdefault('phases', {})
+        self.record.setdefault('bytes', {})
+        self._lock = lock
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time the code in the with block as the phase, the time is recorded even if it raises an
+        exception
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.time() - start)
+
+    def add_phase(self, name, seconds):
+        with self._lock:
+            self.record['phases'][name] = round(self.record['phases'].get(name, 0) + seconds, 6)
+
+    def add_bytes(self, name, count):
+        with self._lock:
+            self.record['bytes'][name] = self.record['bytes'].get(name, 0) + count
+
+    def set(self, **fields):
+        with self._lock:
+            self.record.update(fields)
+
+
+class RunLog(PhaseTimer):
+    """
+    The record for one run of a script, write() appends it to the log file as a line of JSON
+    """
+    def __init__(self, script):
+        self.start = time.time()
+        PhaseTimer.__init__(self, {'script': script, 'host': socket.gethostname(), 'pid': os.getpid(),
+                                   'start': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(self.start)),
+                                   'outcome': None}, threading.Lock())
+
+    def target(self, name):
+        """
+        Return the PhaseTimer for a target of the run, e.g. a CVP cluster
+        """
+        with self._lock:
+            targets = self.record.setdefault('targets', {})
+            targets.setdefault(name, {'outcome': None})
+            record = targets[name]
+        return PhaseTimer(record, self._lock)
+
+    def write(self, filename):
+        """
+        Append the record to the log file, ignoring any error so the log can never stop the run
+        """
+        with self._lock:
+            self.record['duration'] = round(time.time() - self.start, 6)
+            line = json.dumps(self.record, sort_keys=True) + '\n'
+        try:
+            # one write of the whole line in append mode, so runs at the same time don't mix their lines up
+            with open(filename, 'a') as f:
+                f.write(line)
+        except OSError:
+            pass
+
+
+def read_runs(filename):
+    """
+    Read the run records from a log file, skipping any line which isn't valid JSON, e.g. one
+    left half written by a run which was killed
+    """
+    runs = []
+    with open(filename, 'r') as f:
+        for line in f:
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                continue
+    return runs
+
+
+def percentile(values, p):
+    """
+    Return the p'th percentile of a list of numbers using the nearest rank method, or None if
+    the list is empty
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(-(-p * len(ordered) // 100)), 1)
+    return ordered[rank - 1]
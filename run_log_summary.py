@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+
+"""
+DESCRIPTION
+Summarises the JSON run log written by bugalertUpdate.py (bugalertUpdate.jsonl by default), printing
+the 50th and 95th percentile and the maximum time of each phase across the runs, for the run as
+a whole and for the targets (CVP clusters) it updated, along with the bytes moved and how many
+runs ended each way. Use it to see where the time of a scheduled job goes.
+
+Run the script using the following:
+./run_log_summary.py [--log bugalertUpdate.jsonl] [--last 30] [--outcome updated]
+
+This script needs run_log.py in the same directory.
+"""
+__author__ = 'marayson'
+
+import argparse
+import collections
+import sys
+from run_log import read_runs, percentile
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--log', required=False,
+                    default='bugalertUpdate.jsonl', help='JSON run log to summarise')
+parser.add_argument('--last', required=False, type=int,
+                    default=0, help='Only summarise the last this many runs, 0 for all of them')
+parser.add_argument('--outcome', required=False,
+                    default='', help='Only summarise runs which ended with this outcome, e.g. updated or unchanged')
+
+args = parser.parse_args()
+
+try:
+    runs = read_runs(args.log)
+except OSError as ERR:
+    print("Can't read " + args.log + ": " + str(ERR))
+    sys.exit(1)
+if args.outcome:
+    runs = [run for run in runs if run.get('outcome') == args.outcome]
+if args.last:
+    runs = runs[-args.last:]
+if not runs:
+    print("No runs to summarise in " + args.log)
+    sys.exit()
+
+
+# print a line for each name with the number of samples, p50, p95 and maximum of its values
+def print_table(title, samples, unit, scale=1):
+    if not samples:
+        return
+    print("\n" + title)
+    print("  %-20s %6s %12s %12s %12s" % ("", "count", "p50 " + unit, "p95 " + unit, "max " + unit))
+    for name in sorted(samples):
+        values = [x / scale for x in samples[name]]
+        print("  %-20s %6d %12.2f %12.2f %12.2f" % (name, len(values), percentile(values, 50), percentile(values, 95), max(values)))
+
+
+phases = collections.defaultdict(list)
+target_phases = collections.defaultdict(list)
+byte_counts = collections.defaultdict(list)
+outcomes = collections.Counter()
+target_outcomes = collections.Counter()
+for run in runs:
+    outcomes[run.get('outcome')] += 1
+    phases['total'].append(run.get('duration', 0))
+    for name, seconds in run.get('phases', {}).items():
+        phases[name].append(seconds)
+    for name, count in run.get('bytes', {}).items():
+        byte_counts[name].append(count)
+    for target in run.get('targets', {}).values():
+        target_outcomes[target.get('outcome')] += 1
+        for name, seconds in target.get('phases', {}).items():
+            target_phases[name].append(seconds)
+        for name, count in target.get('bytes', {}).items():
+            byte_counts['target ' + name].append(count)
+
+print(str(len(runs)) + " runs from " + str(runs[0].get('start')) + " to " + str(runs[-1].get('start')))
+print("Outcomes: " + ", ".join(str(x) + " " + str(outcomes[x]) for x in sorted(outcomes, key=str)))
+if target_outcomes:
+    print("Target outcomes: " + ", ".join(str(x) + " " + str(target_outcomes[x]) for x in sorted(target_outcomes, key=str)))
+print_table("Run phases", phases, "s")
+print_table("Target phases (each CVP cluster updated)", target_phases, "s")
+print_table("Bytes", byte_counts, "KB", 1024)
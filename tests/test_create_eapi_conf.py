@@ -0,0 +1,138 @@
+"""
+Runs a create_eapi_conf.py sweep against local HTTPS servers standing in for the devices on a
+management range: a switch answering eAPI, a device answering port 443 with a web page, one
+answering with JSON that isn't an eAPI response and an address with nothing listening.
+"""
+
+import datetime
+import json
+import os
+import ssl
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs create_eapi_conf.py with connections to port 443 on the test addresses sent to the local
+# servers instead, any other address is refused
+WRAPPER = """
+import json, os, runpy, socket, sys
+ports = json.loads(os.environ['TEST_PORTS'])
+real_create_connection = socket.create_connection
+def create_connection(address, *args, **kwargs):
+    if address[0] not in ports:
+        raise ConnectionRefusedError(111, 'Connection refused')
+    return real_create_connection(('127.0.0.1', ports[address[0]]), *args, **kwargs)
+socket.create_connection = create_connection
+sys.argv = ['create_eapi_conf.py'] + sys.argv[1:]
+runpy.run_path(os.path.join(os.environ['REPO'], 'create_eapi_conf.py'), run_name='__main__')
+"""
+
+
+def make_handler(content_type, body):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            request = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            reply = body(json.loads(request)) if callable(body) else body
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+    return Handler
+
+
+def eapi_reply(request):
+    return json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': [{'hostname': 'leaf1', 'fqdn': 'leaf1'}]}).encode()
+
+
+def not_eapi_reply(request):
+    return json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': {'status': 'ok'}}).encode()
+
+
+@pytest.fixture
+def tls_context(tmp_path):
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'localhost')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number()).not_valid_before(now)
+            .not_valid_after(now + datetime.timedelta(days=1)).sign(key, hashes.SHA256()))
+    (tmp_path / 'cert.pem').write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    (tmp_path / 'key.pem').write_bytes(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                                         serialization.NoEncryption()))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(str(tmp_path / 'cert.pem'), str(tmp_path / 'key.pem'))
+    return context
+
+
+@pytest.fixture
+def devices(tls_context):
+    handlers = {'10.0.0.1': make_handler('application/json', eapi_reply),
+                '10.0.0.2': make_handler('text/html', b'<html><body>PDU login</body></html>'),
+                '10.0.0.3': make_handler('application/json', not_eapi_reply)}
+    servers = {}
+    for ip, handler in handlers.items():
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.socket = tls_context.wrap_socket(server.socket, server_side=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers[ip] = server
+    yield {ip: servers[ip].server_address[1] for ip in servers}
+    for server in servers.values():
+        server.shutdown()
+        server.server_close()
+
+
+def run_sweep(home, ports, *args):
+    env = dict(os.environ, HOME=str(home), REPO=REPO, TEST_PORTS=json.dumps(ports))
+    return subprocess.run([sys.executable, '-c', WRAPPER] + list(args), env=env, cwd=REPO,
+                          capture_output=True, text=True, timeout=60)
+
+
+def test_sweep_carries_on_past_devices_which_are_not_switches(tmp_path, devices):
+    result = run_sweep(tmp_path, devices, '--addr', '10.0.0.1', '--num', '4', '--user', 'admin', '--passwd', 'admin')
+    assert result.returncode == 0, result.stderr
+    assert 'found 1 switches' in result.stdout
+    for ip in ('10.0.0.2', '10.0.0.3', '10.0.0.4'):
+        assert "Can't connect to " + ip in result.stdout
+    conf = (tmp_path / '.eapi.conf').read_text()
+    assert '[connection:leaf1]' in conf
+    assert 'host: 10.0.0.1' in conf
+    sweep = json.loads((tmp_path / '.eapi.conf.sweep').read_text())
+    assert sweep['10.0.0.1']['hostname'] == 'leaf1'
+    assert all(sweep[ip]['hostname'] is None for ip in ('10.0.0.2', '10.0.0.3', '10.0.0.4'))
+
+
+def test_missing_addresses_is_an_error(tmp_path):
+    result = run_sweep(tmp_path, {}, '--addr', '10.0.0.1', '--user', 'admin', '--passwd', 'admin')
+    assert result.returncode == 2
+    assert '--subnet' in result.stderr
+
+
+def test_existing_eapi_conf_without_update_is_an_error(tmp_path):
+    (tmp_path / '.eapi.conf').write_text('[connection:leaf1]\nhost: 10.0.0.1\n')
+    result = run_sweep(tmp_path, {}, '--addr', '10.0.0.1', '--num', '1', '--user', 'admin', '--passwd', 'admin')
+    assert result.returncode == 1
+    assert 'already exists' in result.stdout
+    assert (tmp_path / '.eapi.conf').read_text() == '[connection:leaf1]\nhost: 10.0.0.1\n'
+
+
+def test_update_renames_a_switch_in_place(tmp_path, devices):
+    conf = ('# lab switches\n[DEFAULT]\ntimeout: 30\n\n[connection:old-name]\nhost: 10.0.0.1\nusername: admin\n'
+            'password: admin\ntransport: https\nrole: leaf\n\n[other]\nkey: value\n')
+    (tmp_path / '.eapi.conf').write_text(conf)
+    result = run_sweep(tmp_path, devices, '--update', '--ttl', '0', '--addr', '10.0.0.1', '--num', '1',
+                       '--user', 'admin', '--passwd', 'admin')
+    assert result.returncode == 0, result.stderr
+    assert (tmp_path / '.eapi.conf').read_text() == conf.replace('[connection:old-name]', '[connection:leaf1]')